@@ -4,11 +4,26 @@ import threading
 import pyttsx3
 import time
 import subprocess
+import tempfile
+import wave
+import os
+from spatial_mixer import SpatialMixer
+from config import SPATIAL_MIXER_ENABLED
+
+# Secondary hazard cues by coverage (same ladder as main): (min coverage, voice params)
+HAZARD_CUES = [
+    (0.35, dict(freq=800, sweep_depth=400, sweep_rate=2)),   # Critical: siren sweep
+    (0.15, dict(freq=880, pulse_rate=5.0, duty=0.5)),        # Approaching: fast beeps
+    (0.05, dict(freq=660, pulse_rate=2.0, duty=0.2)),        # Far: slow beeps
+]
 
 class AudioManager:
-    def __init__(self):
+    BLOCKSIZE = 512
+
+    def __init__(self, recorder=None):
         # --- CONFIGURATION ---
         self.volume = 0.5
+        self.recorder = recorder # Optional FlightRecorder (mode changes, speech, dumps)
         
         # --- ROBUST DEVICE & SAMPLERATE DETECTION ---
         # We query the OS for the 'default' output device (e.g., your Bluetooth buds)
@@ -39,13 +54,20 @@ class AudioManager:
         self.last_tts_time = 0
         self.last_haptic_time = 0
         self.last_spoken_obj = "" 
+
+        # Multi-source mixer: voice 0 mirrors the primary cue, 1..K-1 extra hazards
+        self.mixer = None
+        self.hazard_tracks = []
+        if SPATIAL_MIXER_ENABLED:
+            self.mixer = SpatialMixer(self.sample_rate, self.BLOCKSIZE, volume=self.volume)
+            self.hazard_tracks = [None] * (self.mixer.K - 1)
         
         # Init Stream
         # We do NOT pass a specific device ID. We let the OS route to the default.
         # We ONLY enforce the correct sample rate.
         self.stream = sd.OutputStream(
             channels=2, 
-            blocksize=512, 
+            blocksize=self.BLOCKSIZE, 
             samplerate=self.sample_rate, 
             callback=self.audio_callback
         )
@@ -57,6 +79,12 @@ class AudioManager:
     def stop(self):
         self.stream.stop()
         self.stream.close()
+        if self.mixer: print(self.mixer.report())
+
+    def _set_mode(self, mode):
+        if mode != self.mode and self.recorder:
+            self.recorder.log_event("mode", mode)
+        self.mode = mode
 
     def _trigger_haptic(self, intensity="light"):
         now = time.time()
@@ -73,6 +101,9 @@ class AudioManager:
 
     def audio_callback(self, outdata, frames, time_info, status):
         if status: print(f"[Audio Status] {status}")
+        if self.mixer:
+            self.mixer.render(outdata, frames)
+            return
         current_time = time.time()
         
         # Calculate Stereo Pan
@@ -118,23 +149,102 @@ class AudioManager:
             outdata.fill(0)
             self.phase = 0
 
+    # --- MIXER INTERFACE ---
+
+    def _sync_primary(self):
+        """Mirrors the single-cue state (mode, pan, freq, beep timing) onto mixer voice 0."""
+        if not self.mixer: return
+        if self.mode == "siren":
+            self.mixer.set_voice(0, freq=800, gain=0.8, pan=self.current_pan, sweep_depth=400, sweep_rate=2)
+        elif self.mode == "beep" and self.beep_interval > 0:
+            self.mixer.set_voice(0, freq=self.target_freq, gain=1.0, pan=self.current_pan,
+                                 pulse_rate=1.0 / self.beep_interval,
+                                 duty=self.beep_duration / self.beep_interval)
+        else:
+            self.mixer.set_voice(0, gain=0.0, pan=self.current_pan)
+
+    def set_hazards(self, hazards):
+        """
+        Extra simultaneous hazards as (label, pan, coverage), best first.
+        Each keeps its voice across frames (same label, nearest pan) so
+        voices glide instead of jumping between objects.
+        """
+        if not self.mixer: return
+        tracks = self.hazard_tracks
+        assigned = [None] * len(tracks)
+        pending = []
+
+        for label, pan, coverage in hazards[:len(tracks)]:
+            cue = next((params for min_cov, params in HAZARD_CUES if coverage > min_cov), None)
+            if cue is None: continue
+            best = None
+            for i, track in enumerate(tracks):
+                if assigned[i] or track is None or track[0] != label: continue
+                dist = abs(track[1] - pan)
+                if dist < 0.5 and (best is None or dist < best[0]):
+                    best = (dist, i)
+            if best: assigned[best[1]] = (label, pan, cue)
+            else: pending.append((label, pan, cue))
+
+        for hazard in pending:
+            i = assigned.index(None)
+            assigned[i] = hazard
+
+        for i, hazard in enumerate(assigned):
+            if hazard is None:
+                tracks[i] = None
+                self.mixer.set_voice(i + 1, gain=0.0)
+            else:
+                label, pan, cue = hazard
+                tracks[i] = (label, pan)
+                self.mixer.set_voice(i + 1, gain=0.6, pan=pan, **cue)
+
+    def _prerender_speech(self, text):
+        """Renders TTS to a float mono buffer at the stream rate (never on the audio thread)."""
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            eng = pyttsx3.init()
+            eng.setProperty('rate', 150)
+            eng.save_to_file(text, path)
+            eng.runAndWait()
+            with wave.open(path, 'rb') as wf:
+                rate, channels, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+                raw = wf.readframes(wf.getnframes())
+            if width != 2: return None
+
+            samples = np.frombuffer(raw, dtype=np.int16).astype(np.float64) / 32768.0
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            if rate != self.sample_rate:
+                n_out = int(len(samples) * self.sample_rate / rate)
+                samples = np.interp(np.linspace(0, len(samples) - 1, n_out), np.arange(len(samples)), samples)
+            return samples
+        except Exception as e:
+            print(f"[Audio] Speech pre-render failed: {e}")
+            return None
+        finally:
+            if os.path.exists(path): os.remove(path)
+
     # --- DANGER INTERFACE (LEVELS) ---
 
     def set_danger_far(self, pan):
         """Level 1: Far (~1m). Warning Beeps."""
-        self.mode = "beep"
+        self._set_mode("beep")
         self.current_pan = pan
         self.target_freq = 660  # High-ish pitch
         self.beep_interval = 0.5 # Medium speed
         self.beep_duration = 0.1
+        self._sync_primary()
 
     def set_danger_approaching(self, pan, obj_name):
         """Level 2: Mid (0.5-0.7m). Fast Beeps + Voice."""
-        self.mode = "beep"
+        self._set_mode("beep")
         self.current_pan = pan
         self.target_freq = 880  # Higher pitch
         self.beep_interval = 0.2 # Fast speed
         self.beep_duration = 0.1
+        self._sync_primary()
         self._trigger_haptic("light")
         
         # Voice Warning Overlay
@@ -145,9 +255,11 @@ class AudioManager:
 
     def set_danger_critical(self, pan):
         """Level 3: Close (<0.5m). Siren + Heavy Haptic."""
-        self.mode = "siren"
+        self._set_mode("siren")
         self.current_pan = pan 
+        self._sync_primary()
         self._trigger_haptic("heavy")
+        if self.recorder: self.recorder.trigger("critical")
 
     # --- SAFE OBJECT INTERFACE ---
 
@@ -171,21 +283,35 @@ class AudioManager:
             self.last_spoken_obj = obj_name
 
     def silence(self):
-        self.mode = "silence"
+        self._set_mode("silence")
         self.is_beeping = False
         self.beep_interval = 0.0
+        self._sync_primary()
 
-    def speak(self, text):
-        if self.speaking_lock: return
+    def speak(self, text, on_start=None):
+        """
+        Speaks text off-thread. Returns False if dropped (already speaking).
+        on_start: called (on the TTS thread) when the utterance starts playing.
+        """
+        if self.speaking_lock: return False
+        if self.recorder: self.recorder.log_event("speech", text)
         
         # [OPTIMIZATION] Set lock IMMEDIATELY before thread spawns
         self.speaking_lock = True
         
         def _run():
             try:
+                samples = self._prerender_speech(text) if self.mixer else None
+                if samples is not None:
+                    # Mixed into the output stream; hazard voices duck under it
+                    self.mixer.queue_speech(samples)
+                    if on_start: on_start()  # Audible from the next block
+                    time.sleep(len(samples) / self.sample_rate)
+                    return
                 eng = pyttsx3.init()
                 # 150 is a good comfortable speed
                 eng.setProperty('rate', 150) 
+                if on_start: eng.connect('started-utterance', lambda name: on_start())
                 eng.say(text)
                 eng.runAndWait()
             except: pass
@@ -193,4 +319,5 @@ class AudioManager:
                 # Release lock only when audio is actually finished
                 self.speaking_lock = False
                 
-        threading.Thread(target=_run).start()
\ No newline at end of file
+        threading.Thread(target=_run).start()
+        return True
@@ -0,0 +1,121 @@
+"""
+Cascade operating point: escalation rate and recall vs. always-large.
+
+Runs both models once over a recorded test set (a video file or a folder
+of images), then replays the cascade policy offline for a grid of
+CASCADE_LOW_CONF_MARGIN / CASCADE_AUDIT_INTERVAL values.
+
+Recall is measured against the always-large output:
+  - decision recall: frames where the large model says "danger ahead"
+                     and the cascade agrees
+  - object recall:   large-model danger-class boxes ahead (conf >= threshold)
+                     matched by the cascade (same class, IoU >= 0.5)
+
+Run from src/:  python bench_cascade.py <video | image folder> [max frames]
+"""
+import glob
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from danger_engine import DangerEngine, escalation_reason, score_detections
+from config import CONFIDENCE_THRESHOLD, DANGER_CLASSES
+
+MARGINS = [0.0, 0.05, 0.10, 0.15, 0.20]
+AUDIT_INTERVALS = [0, 5, 10, 30]
+
+def load_frames(source, limit):
+    if os.path.isdir(source):
+        paths = sorted(p for ext in ("jpg", "jpeg", "png") for p in glob.glob(os.path.join(source, f"*.{ext}")))
+        for path in paths[:limit]:
+            yield cv2.imread(path)
+        return
+    cap = cv2.VideoCapture(source)
+    count = 0
+    while count < limit:
+        grabbed, frame = cap.read()
+        if not grabbed: break
+        count += 1
+        yield frame
+    cap.release()
+
+def danger_boxes(dets, width):
+    """Boxes that drive the danger decision: danger class, confident, in the center band."""
+    if len(dets) == 0:
+        return dets
+    center_x = (dets[:, 0] + dets[:, 2]) / 2
+    keep = (np.isin(dets[:, 5].astype(int), DANGER_CLASSES) & (dets[:, 4] >= CONFIDENCE_THRESHOLD)
+            & (center_x > width * 0.25) & (center_x < width * 0.75))
+    return dets[keep]
+
+def iou(box, boxes):
+    ix1 = np.maximum(box[0], boxes[:, 0])
+    iy1 = np.maximum(box[1], boxes[:, 1])
+    ix2 = np.minimum(box[2], boxes[:, 2])
+    iy2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.maximum(ix2 - ix1, 0) * np.maximum(iy2 - iy1, 0)
+    area = lambda b: (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area(box) + area(boxes) - inter, 1e-6)
+
+def main(source, limit):
+    engine = DangerEngine(tiled=False, cascade=True)  # Loads both models
+    names = engine.model.names
+
+    small, large = [], []
+    small_time = large_time = 0.0
+    for frame in load_frames(source, limit):
+        frame = cv2.resize(frame, (640, 640))  # Same input as main()
+        t0 = time.perf_counter()
+        small.append(engine._detect(frame, model=engine.small_model))
+        t1 = time.perf_counter()
+        large.append(engine._detect(frame))
+        small_time += t1 - t0
+        large_time += time.perf_counter() - t1
+
+    n = len(large)
+    if n == 0:
+        print("No frames found.")
+        return
+    small_ms, large_ms = 1000 * small_time / n, 1000 * large_time / n
+    print(f"{n} frames | small {small_ms:.1f} ms/frame, large {large_ms:.1f} ms/frame")
+
+    width = 640
+    ref_decisions = [score_detections(d, names, width, width)[0] for d in large]
+    ref_boxes = [danger_boxes(d, width) for d in large]
+    total_decisions = sum(ref_decisions)
+    total_boxes = sum(len(b) for b in ref_boxes)
+    print(f"Reference (always-large): {total_decisions} danger frames, {total_boxes} danger boxes\n")
+
+    print(f"{'margin':>6} {'audit':>5} | {'escalated':>9} | {'decision rec':>12} | "
+          f"{'object rec':>10} | {'false alarms':>12} | {'est ms/frame':>12}")
+    for margin in MARGINS:
+        for audit in AUDIT_INTERVALS:
+            escalated = hit_decisions = hit_boxes = false_alarms = 0
+            for i in range(n):
+                reason = escalation_reason(small[i], width, i, margin=margin, audit_interval=audit)
+                out = large[i] if reason else small[i]
+                escalated += reason is not None
+
+                decision = score_detections(out, names, width, width)[0]
+                hit_decisions += decision and ref_decisions[i]
+                false_alarms += decision and not ref_decisions[i]
+
+                found = danger_boxes(out, width)
+                for box in ref_boxes[i]:
+                    same = found[found[:, 5] == box[5]]
+                    if len(same) and iou(box, same).max() >= 0.5:
+                        hit_boxes += 1
+
+            rate = escalated / n
+            decision_recall = hit_decisions / total_decisions if total_decisions else 1.0
+            object_recall = hit_boxes / total_boxes if total_boxes else 1.0
+            est_ms = small_ms + rate * large_ms
+            print(f"{margin:>6.2f} {audit:>5} | {rate:>9.1%} | {decision_recall:>12.1%} | "
+                  f"{object_recall:>10.1%} | {false_alarms:>12} | {est_ms:>12.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+    else:
+        main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10**9)
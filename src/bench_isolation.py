@@ -0,0 +1,71 @@
+"""
+Audio callback jitter: YOLO in-process vs. isolated worker process.
+
+A thread stands in for the PortAudio callback (512 frames @ 48 kHz): it
+wakes every block period and renders the spatial mixer, which needs the
+GIL just like the real callback. While the main thread keeps the
+detector busy, we record how late each block starts and how many would
+have underrun.
+
+Run from src/:  python bench_isolation.py [seconds per mode]
+"""
+import sys
+import threading
+import time
+import numpy as np
+from danger_engine import DangerEngine
+from inference_worker import InferenceProcess
+from spatial_mixer import SpatialMixer
+
+SAMPLE_RATE = 48000
+BLOCKSIZE = 512
+
+def fake_callback(stop, lateness, underruns):
+    mixer = SpatialMixer(SAMPLE_RATE, BLOCKSIZE)
+    mixer.set_voice(0, freq=800, gain=1.0, pan=0.5, sweep_depth=400, sweep_rate=2)
+    out = np.zeros((BLOCKSIZE, 2), dtype=np.float32)
+    period = BLOCKSIZE / SAMPLE_RATE
+    next_wake = time.perf_counter() + period
+    while not stop.is_set():
+        time.sleep(max(0.0, next_wake - time.perf_counter()))
+        start = time.perf_counter()
+        lateness.append(start - next_wake)
+        mixer.render(out, BLOCKSIZE)
+        if time.perf_counter() > next_wake + period:
+            underruns[0] += 1
+        next_wake += period
+
+def run(label, engine, seconds):
+    frame = (np.random.default_rng(0).random((640, 640, 3)) * 255).astype(np.uint8)
+    stop = threading.Event()
+    lateness, underruns = [], [0]
+    t = threading.Thread(target=fake_callback, args=(stop, lateness, underruns), daemon=True)
+    t.start()
+
+    inferences = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        engine.analyze(frame)
+        inferences += 1
+    stop.set()
+    t.join()
+
+    ms = np.array(lateness) * 1000
+    print(f"{label:>10}: {inferences / seconds:5.1f} inf/s | callback lateness "
+          f"p50 {np.percentile(ms, 50):.2f} ms, p99 {np.percentile(ms, 99):.2f} ms, "
+          f"max {ms.max():.2f} ms | underruns {underruns[0]}/{len(ms)}")
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+
+    engine = DangerEngine()
+    engine.analyze(np.zeros((640, 640, 3), dtype=np.uint8))  # Warm-up
+    run("in-process", engine, seconds)
+    del engine
+
+    worker = InferenceProcess()
+    while not worker.ready:
+        worker.analyze(np.zeros((640, 640, 3), dtype=np.uint8))
+        time.sleep(0.1)
+    run("isolated", worker, seconds)
+    worker.stop()
@@ -14,13 +14,82 @@ USE_GPU = True  # Set to True for your RTX 3050
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 YOLO_MODEL_PATH = "yolov8l.pt"
 
+# --- MODEL CASCADE (small always-on, large on demand) ---
+CASCADE_ENABLED = False
+CASCADE_SMALL_MODEL = "yolov8n.pt"
+CASCADE_LOW_CONF_MARGIN = 0.15   # Escalate on detections within +/- this of CONFIDENCE_THRESHOLD
+CASCADE_AUDIT_INTERVAL = 10      # Large model every N frames regardless (0 = never)
+
 ORS_API_KEY = os.getenv("ORS_API_KEY")
 DEMO_ORIGIN_COORDS = (77.534, 12.935)
+GAZETTEER_PATH = "places.tsv"    # Saved / frequent places: name, lon, lat, visits, aliases
+GAZETTEER_MIN_SCORE = 0.75       # Fuzzy match threshold (0-1)
+
+# --- SERVICES (async I/O layer) ---
+# Override the endpoints to point at local fake servers for testing
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # None = Google default
+ORS_BASE_URL = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org")
+SERVICE_MAX_CONCURRENCY = 4
+SERVICE_MAX_RETRIES = 2
+SERVICE_RETRY_BASE_DELAY = 0.25  # Seconds, doubled per attempt (full jitter)
+GEMINI_DEADLINE = 10.0           # Vision QA / scene description
+STT_DEADLINE = 8.0               # Transcription
+ROUTE_DEADLINE = 12.0            # Geocode + directions
+VOICE_DEADLINE = 40.0            # Whole voice interaction (record -> answer)
+VOICE_SINGLE_ROUNDTRIP = False   # Audio + frame in one request (intent + answer)
+FRAME_UPLOAD_DEADLINE = 5.0      # Speculative frame upload while the user speaks
+VOICE_FRAME_SETTLE_TIMEOUT = 1.0 # Max wait for exposure to settle after the hand leaves the lens
+VOICE_FRAME_SETTLE_DELTA = 2.0   # Settled once mean luminance changes less than this per sample
+VOICE_FRAME_SETTLE_INTERVAL = 0.1  # Seconds between luminance samples
+VOICE_QA_DEADLINE = 12.0         # Combined audio + frame request
 # --- THRESHOLDS ---
 CONFIDENCE_THRESHOLD = 0.5
 DANGER_CLASSES = [2, 3, 5, 7, 67, 39]  # Car, Motorcycle, Bus, Truck, Cell Phone , Bottle
 SAFE_CLASSES = [0, 56, 57]     # Person, Chair, Couch
 BRIGHTNESS_TRIGGER = 30        # Low light trigger for Gemini
+GESTURE_RELEASE_MARGIN = 10    # Uncovered once brightness > trigger + margin (hysteresis)
+GESTURE_HOLD_DURATION = 2.0     # Seconds the lens must stay covered
+GESTURE_COOLDOWN = 2.0          # Ignore re-covering right after a trigger
+GESTURE_THUMB_SIZE = (32, 24)   # Luminance thumbnail
+
+# --- TILED INFERENCE (center corridor hi-res, periphery low-res) ---
+TILED_INFERENCE = False
+TILE_CENTER_BAND = (0.15, 0.85)  # Danger band is 0.25-0.75; extra margin catches straddling objects
+TILE_CENTER_IMGSZ = 640          # Upper bound; smaller crops run at their native size
+TILE_PERIPHERY_IMGSZ = 320
+TILE_PERIPHERY_INTERVAL = 2      # Refresh periphery every N frames
+TILE_MERGE_OVERLAP = 0.6         # Cross-tile NMS (intersection / smaller box)
+
+# --- SCENE-CHANGE GATING (reuse detections while the scene is static) ---
+SCENE_GATE_ENABLED = False
+SCENE_THUMB_SIZE = (64, 48)      # (width, height) grayscale thumbnail
+SCENE_DIFF_THRESHOLD = 6.0       # Mean abs gray difference (0-255)
+SCENE_SHIFT_THRESHOLD = 1.0      # Global shift in thumbnail pixels
+SCENE_MAX_STALENESS = 0.5        # Seconds; fresh inference forced after this
+SCENE_REPORT_INTERVAL = 30.0     # Seconds between skip-ratio reports
+
+# --- FLIGHT RECORDER (in-memory ring buffer, dumped on CRITICAL) ---
+FLIGHT_WINDOW = 20.0             # Seconds of history kept
+FLIGHT_THUMB_SIZE = (160, 120)   # Stored frame size
+FLIGHT_JPEG_QUALITY = 60
+FLIGHT_DUMP_DIR = "flight_logs"
+FLIGHT_DUMP_COOLDOWN = 10.0      # Min seconds between automatic dumps
+FLIGHT_POST_TRIGGER = 2.0        # Keep recording this long after the trigger
+
+# --- SPATIAL MIXER (simultaneous hazard voices + ducked speech) ---
+SPATIAL_MIXER_ENABLED = False
+MIXER_MAX_VOICES = 4             # Voice 0 = primary cue, 1..3 = other hazards
+MIXER_ITD_MAX = 0.00066          # Max interaural delay in seconds (~head width)
+MIXER_DUCK_LEVEL = 0.35          # Hazard voice gain while speech plays
+MIXER_SPEECH_GAIN = 0.9
+MIXER_PAN_SMOOTHING = 0.3        # Per-block pan glide (0-1)
+
+# --- ISOLATED INFERENCE (YOLO in its own process, shared-memory frames) ---
+INFERENCE_ISOLATED = False
+INFERENCE_MAX_FRAME = (1080, 1920)  # (height, width) of each shared frame slot
+INFERENCE_MAX_DETECTIONS = 300
+INFERENCE_TIMEOUT = 2.0             # Seconds before a worker counts as hung
+INFERENCE_RESTART_BACKOFF = 3.0     # Min seconds between restarts
 
 # --- AUDIO PATHS ---
 AUDIO_DIR = "audio"
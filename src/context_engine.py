@@ -1,131 +1,239 @@
 from google import genai
 from google.genai.errors import APIError
-from google.genai.types import Part
+from google.genai.types import Part, HttpOptions, GenerateContentConfig, UploadFileConfig
+import asyncio
 import cv2
-import threading
-import os
+import io
+import json
 # Assuming config.py is in the same directory
-from config import GEMINI_API_KEY 
+from config import (GEMINI_API_KEY, GEMINI_BASE_URL, GEMINI_DEADLINE, STT_DEADLINE,
+                    FRAME_UPLOAD_DEADLINE, VOICE_QA_DEADLINE)
 
 class ContextEngine:
-    
+
     # Using 2.0 Flash for best speed/latency balance
-    MODEL_NAME = 'gemini-2.5-flash' 
+    MODEL_NAME = 'gemini-2.5-flash'
+
+    # Service-layer key: a new vision request supersedes the previous one
+    VISION_KEY = "gemini.vision"
+
+    INTENTS = ("navigate", "question", "describe")
+    VOICE_PROMPT = (
+        "I am blind; the image is my camera view and the audio is my spoken request. "
+        "Reply with JSON only: {\"intent\": \"navigate\" | \"question\" | \"describe\", "
+        "\"transcript\": what I said, \"destination\": the place name if I asked to be "
+        "taken somewhere, otherwise \"\", \"answer\": one short sentence answering my question, "
+        "or telling me what is directly in front of me and if it is safe; \"\" for navigate}"
+    )
 
-    def __init__(self, tts_callback):
+    def __init__(self, tts_callback, services, client=None):
         self.api_key = GEMINI_API_KEY
-        self.client = None 
-        self.is_busy = False
+        self.client = client # Inject a fake client (same .aio surface) for tests
+        self.services = services  # ServiceLayer (async I/O loop)
         self.tts = tts_callback # Function to call when text is ready
-        self._setup_gemini()
+        self._cleanup = set()  # Pending uploaded-frame deletions (keep tasks referenced)
+        if self.client is None:
+            self._setup_gemini()
 
     def _setup_gemini(self):
-        """Initializes the Gemini Client."""
+        """Initializes the Gemini Client (one client = one reused connection pool)."""
         try:
             # Client is created and API key is passed explicitly
-            self.client = genai.Client(api_key=self.api_key)
+            http_options = HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+            self.client = genai.Client(api_key=self.api_key, http_options=http_options)
             print(f"[System] Gemini client initialized with {self.MODEL_NAME}")
         except Exception as e:
             print(f"[System] Gemini Initialization Error: {e}")
-            self.client = None 
+            self.client = None
 
-    def _gemini_worker(self, frame, prompt):
+    @property
+    def is_busy(self):
+        return self.services.is_busy(self.VISION_KEY)
+
+    async def _gemini_query(self, frame, prompt):
         """
-        Worker function for all threaded Gemini calls (Vision QA).
+        Async worker for all Gemini calls (Vision QA).
         Uses in-memory byte encoding to bypass file path I/O latency.
         """
-        if not self.client:
-            self.tts("I am not connected to the AI service.")
-            return
+        # 1. Encode the frame (NumPy array) directly to JPEG bytes in memory
+        # (Optimization: No disk I/O)
+        success, buffer = cv2.imencode('.jpg', frame)
+        if not success:
+            raise ValueError("Could not encode frame to JPEG bytes.")
 
-        self.is_busy = True
-        
-        try:
-            # 1. Encode the frame (NumPy array) directly to JPEG bytes in memory
-            # (Optimization: No disk I/O)
-            success, buffer = cv2.imencode('.jpg', frame)
-            if not success:
-                raise ValueError("Could not encode frame to JPEG bytes.")
-
-            image_bytes = buffer.tobytes()
-            
-            # 2. Create the image part directly from the in-memory bytes
-            image_part = Part.from_bytes(data=image_bytes, mime_type='image/jpeg')
-            
-            # 3. Call the model via the client (Streaming for faster feedback)
-            response_stream = self.client.models.generate_content_stream(
-                model=self.MODEL_NAME, 
+        # 2. Create the image part directly from the in-memory bytes
+        image_part = Part.from_bytes(data=buffer.tobytes(), mime_type='image/jpeg')
+
+        async def _attempt():
+            # 3. Call the model via the async client (Streaming for faster feedback)
+            response_stream = await self.client.aio.models.generate_content_stream(
+                model=self.MODEL_NAME,
                 contents=[prompt, image_part]
             )
-            
             # 4. Process streaming response
             text = ""
-            for chunk in response_stream:
-                text += chunk.text
-            
-            text = text.strip()
-            print(f"[Gemini] {text}")
-            self.tts(text) # Speak the full result
-            
-        except APIError as e:
-            print(f"[Gemini API Error] {e}")
+            async for chunk in response_stream:
+                text += chunk.text or ""
+            return text.strip()
+
+        return await self.services.call(_attempt, deadline=GEMINI_DEADLINE)
+
+    def _on_answer(self, text):
+        print(f"[Gemini] {text}")
+        self.tts(text) # Speak the full result
+
+    def _on_error(self, exc):
+        if isinstance(exc, APIError):
+            print(f"[Gemini API Error] {exc}")
             self.tts("Service error.")
-        except Exception as e:
-            print(f"[Gemini General Error] {e}")
+        elif isinstance(exc, asyncio.TimeoutError):
+            print("[Gemini] Deadline exceeded.")
+            self.tts("The AI service is taking too long.")
+        else:
+            print(f"[Gemini General Error] {exc}")
             self.tts("I encountered an issue processing the image.")
-        finally:
-            self.is_busy = False
 
-    def transcribe_audio(self, audio_file_path: str) -> str:
+    def _submit_vision(self, frame, prompt):
+        self.services.submit(
+            self.VISION_KEY,
+            lambda: self._gemini_query(frame, prompt),
+            deadline=GEMINI_DEADLINE,
+            on_result=self._on_answer,
+            on_error=self._on_error,
+        )
+
+    async def transcribe_audio(self, audio_bytes: bytes) -> str:
         """
-        Synchronous call to transcribe audio using Gemini.
+        Async call to transcribe in-memory WAV audio using Gemini (await on the service loop).
         """
-        if not self.client or not os.path.exists(audio_file_path):
+        if not self.client or not audio_bytes:
             return ""
 
         print("[System] Transcribing audio...")
         try:
-            # 1. Read the audio file into memory
-            with open(audio_file_path, 'rb') as f:
-                audio_bytes = f.read()
-
-            # 2. Create the Part object directly from bytes
+            # 1. Create the Part object directly from bytes
             audio_part = Part.from_bytes(data=audio_bytes, mime_type='audio/wav')
-            
-            # 3. Call the model
-            response = self.client.models.generate_content(
-                model=self.MODEL_NAME,
-                contents=[audio_part, "Transcribe the audio in its entirety."]
-            )
 
-            return response.text.strip()
-            
+            # 2. Call the model
+            async def _attempt():
+                return await self.client.aio.models.generate_content(
+                    model=self.MODEL_NAME,
+                    contents=[audio_part, "Transcribe the audio in its entirety."]
+                )
+
+            response = await self.services.call(_attempt, deadline=STT_DEADLINE)
+            return (response.text or "").strip()
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"[STT Error] {e}")
+            print(f"[STT Error] {e!r}")
             return ""
 
+    async def prepare_frame(self, frame):
+        """
+        Speculative half of a voice query: encode the frame and upload it
+        while the user is still speaking. Falls back to inline bytes.
+        Returns (image_part, uploaded file name or None); pass the task to
+        discard_frame() when done.
+        """
+        success, buffer = await self.services.run_blocking(cv2.imencode, '.jpg', frame)
+        if not success:
+            raise ValueError("Could not encode frame to JPEG bytes.")
+        image_bytes = buffer.tobytes()
+
+        try:
+            uploaded = await self.services.call(
+                lambda: self.client.aio.files.upload(
+                    file=io.BytesIO(image_bytes), config=UploadFileConfig(mime_type='image/jpeg')),
+                deadline=FRAME_UPLOAD_DEADLINE
+            )
+            return Part.from_uri(file_uri=uploaded.uri, mime_type='image/jpeg'), uploaded.name
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Gemini] Frame upload failed, sending inline: {e!r}")
+            return Part.from_bytes(data=image_bytes, mime_type='image/jpeg'), None
+
+    def discard_frame(self, upload):
+        """
+        Deletes the uploaded frame (a picture of the user's surroundings)
+        from the Files API as soon as the prepare_frame() task settles, so
+        it is not kept server-side. Safe for failed or inline uploads.
+        Call on the service loop.
+        """
+        def _delete(task):
+            if task.cancelled() or task.exception() is not None: return
+            _, name = task.result()
+            if name:
+                cleanup = asyncio.ensure_future(self._delete_file(name))
+                self._cleanup.add(cleanup)
+                cleanup.add_done_callback(self._cleanup.discard)
+
+        if upload.done(): _delete(upload)
+        else: upload.add_done_callback(_delete)
+
+    async def _delete_file(self, name):
+        try:
+            await self.services.call(lambda: self.client.aio.files.delete(name=name),
+                                     deadline=FRAME_UPLOAD_DEADLINE)
+        except Exception as e:
+            print(f"[Gemini] Could not delete uploaded frame {name}: {e!r}")
+
+    async def voice_query(self, audio_bytes: bytes, image_part):
+        """
+        One multimodal round trip: audio + frame in, structured intent out.
+        Returns {"intent", "transcript", "destination", "answer"}.
+        """
+        audio_part = Part.from_bytes(data=audio_bytes, mime_type='audio/wav')
+
+        async def _attempt():
+            return await self.client.aio.models.generate_content(
+                model=self.MODEL_NAME,
+                contents=[self.VOICE_PROMPT, image_part, audio_part],
+                config=GenerateContentConfig(response_mime_type='application/json')
+            )
+
+        response = await self.services.call(_attempt, deadline=VOICE_QA_DEADLINE)
+        return self._parse_intent(response.text or "")
+
+    def _parse_intent(self, text):
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.strip("`").removeprefix("json").strip()
+        try:
+            data = json.loads(text)
+            if not isinstance(data, dict): raise ValueError("not an object")
+        except ValueError:
+            # Model ignored the format: treat the text as the answer
+            return {"intent": "question", "transcript": "", "destination": "", "answer": text}
+
+        intent = str(data.get("intent", "")).lower()
+        return {
+            "intent": intent if intent in self.INTENTS else "describe",
+            "transcript": str(data.get("transcript") or ""),
+            "destination": str(data.get("destination") or ""),
+            "answer": str(data.get("answer") or ""),
+        }
+
     def describe_scene(self, frame):
-        """Threaded call for immediate scene description."""
-        if self.is_busy or not self.client: return
+        """Non-blocking call for immediate scene description."""
+        if not self.client: return
 
         prompt = "I am blind. In one very short sentence, tell me what is directly in front of me and if it is safe."
-        # Daemon thread ensures main program doesn't hang waiting for this
-        threading.Thread(target=self._gemini_worker, args=(frame, prompt), daemon=True).start()
+        # Supersedes any answer still in flight; main loop never waits on it
+        self._submit_vision(frame, prompt)
 
     def answer_question(self, frame, question: str):
         """
-        Threaded call to answer a specific user question.
+        Non-blocking call to answer a specific user question.
         """
-        if self.is_busy: 
-            self.tts("I am currently busy, please wait.")
-            return
-            
         if not self.client:
             self.tts("I am not connected to the language service.")
             return
 
         # [OPTIMIZATION] Shortened system instruction for faster generation
         prompt = f"Answer concisely. Question: \"{question}\""
-        
+
         print(f"[System] Triggering QA: {question}")
-        threading.Thread(target=self._gemini_worker, args=(frame, prompt), daemon=True).start()
\ No newline at end of file
+        self._submit_vision(frame, prompt)
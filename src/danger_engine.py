@@ -1,15 +1,161 @@
 from ultralytics import YOLO
+import numpy as np
 import torch
 # FIXED: Removed '.' before config
-from config import YOLO_MODEL_PATH, DANGER_CLASSES, CONFIDENCE_THRESHOLD, USE_GPU
+from config import (YOLO_MODEL_PATH, DANGER_CLASSES, CONFIDENCE_THRESHOLD, USE_GPU,
+                    TILED_INFERENCE, TILE_CENTER_BAND, TILE_CENTER_IMGSZ,
+                    TILE_PERIPHERY_IMGSZ, TILE_PERIPHERY_INTERVAL, TILE_MERGE_OVERLAP,
+                    MIXER_MAX_VOICES, CASCADE_ENABLED, CASCADE_SMALL_MODEL,
+                    CASCADE_LOW_CONF_MARGIN, CASCADE_AUDIT_INTERVAL)
+
+# High priority classes get a score multiplier
+PRIORITY = {'person': 2.0, 'car': 3.0, 'truck': 3.5, 'bus': 3.5, 'motorcycle': 2.5, 'bicycle': 2.0}
+
+def merge_detections(center_dets, periphery_dets, overlap_thresh=TILE_MERGE_OVERLAP):
+    """
+    Cross-tile NMS on two (N, 6) [x1, y1, x2, y2, conf, cls] arrays.
+    Each tile was already NMS'd by YOLO, so only pairs from different
+    tiles with the same class are compared. Overlap is intersection /
+    smaller area, so a box clipped by the tile edge is still recognized
+    as a duplicate of the full box; duplicates are fused into their union
+    and the highest score survives.
+    """
+    dets = np.concatenate([center_dets, periphery_dets])
+    if len(dets) == 0:
+        return dets
+
+    tile = np.arange(len(dets)) >= len(center_dets)
+    x1, y1, x2, y2, conf, cls = dets.T
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-conf)
+    suppressed = np.zeros(len(dets), dtype=bool)
+    merged = []
+
+    for i in order:
+        if suppressed[i]: continue
+        ix1 = np.maximum(x1[i], x1)
+        iy1 = np.maximum(y1[i], y1)
+        ix2 = np.minimum(x2[i], x2)
+        iy2 = np.minimum(y2[i], y2)
+        inter = np.maximum(ix2 - ix1, 0) * np.maximum(iy2 - iy1, 0)
+        overlap = inter / np.maximum(np.minimum(areas[i], areas), 1e-6)
+
+        dup = (overlap > overlap_thresh) & (cls == cls[i]) & (tile != tile[i]) & ~suppressed
+        dup[i] = True  # Always part of its own group (even a zero-area box)
+        box = dets[i].copy()
+        box[0], box[1] = x1[dup].min(), y1[dup].min()
+        box[2], box[3] = x2[dup].max(), y2[dup].max()
+
+        suppressed |= dup
+        merged.append(box)
+
+    return np.stack(merged)
+
+def score_detections(dets, names, width, height, view_size=None):
+    """
+    Danger decision + smart object selection over a detection array.
+    Shared by DangerEngine and the isolated InferenceProcess client.
+
+    Returns (danger_detected, danger_label, closest_obj, hazards).
+    """
+    if view_size is not None:
+        dets = dets.copy()
+        dets[:, [0, 2]] *= view_size[0] / width
+        dets[:, [1, 3]] *= view_size[1] / height
+        width, height = view_size
+
+    center_zone_start = width * 0.25
+    center_zone_end = width * 0.75
+
+    danger_detected = False
+    danger_label = ""
+    closest_obj = None
+
+    # [CHANGED] Smart Selection Variables
+    max_score = 0
+    hazards = []
+
+    for det in dets:
+        conf = float(det[4])
+        cls_id = int(det[5])
+
+        if conf < CONFIDENCE_THRESHOLD: continue
+
+        # Bounding Box Coords
+        x1, y1, x2, y2 = map(int, det[:4])
+        area = (x2 - x1) * (y2 - y1)
+        center_x = (x1 + x2) // 2
+        label = names[cls_id]
+
+        # 1. Global Danger Check (Is there ANY danger in front?)
+        if cls_id in DANGER_CLASSES:
+            # Is it in front of us?
+            if center_zone_start < center_x < center_zone_end:
+                danger_detected = True
+                danger_label = label
+
+        # 2. Smart Object Selection
+        # Formula: Score = Size * ClassPriority * CenterBias
+
+        # Get priority weight (default 1.0)
+        weight = PRIORITY.get(label, 1.0)
+
+        # Calculate Center Bias (1.0 = perfectly centered, 0.0 = edge)
+        center_bias = 1.0 - (abs(center_x - (width / 2)) / width)
+
+        # Final Score
+        score = area * weight * center_bias
+
+        obj = {
+            "center_x": center_x,
+            "area": area,
+            "box": (x1, y1, x2, y2),
+            "label": label
+        }
+        # Mixer voices are for danger classes only (a person is announced, never beeped)
+        if cls_id in DANGER_CLASSES:
+            hazards.append((score, obj))
+
+        if score > max_score:
+            max_score = score
+            closest_obj = obj
+
+    hazards.sort(key=lambda h: h[0], reverse=True)
+    hazards = [obj for _, obj in hazards[:MIXER_MAX_VOICES]]
+
+    return danger_detected, danger_label, closest_obj, hazards
+
+def escalation_reason(dets, width, frame_index,
+                      margin=CASCADE_LOW_CONF_MARGIN, audit_interval=CASCADE_AUDIT_INTERVAL):
+    """
+    Cascade policy: should the large model look at this frame?
+    Returns "candidate", "low_conf", "audit" or None (small model is enough).
+    """
+    if audit_interval and frame_index % audit_interval == 0:
+        return "audit"
+    if len(dets) == 0:
+        return None
+
+    conf = dets[:, 4]
+    center_x = (dets[:, 0] + dets[:, 2]) / 2
+    in_band = (center_x > width * 0.25) & (center_x < width * 0.75)
+    is_danger = np.isin(dets[:, 5].astype(int), DANGER_CLASSES)
+
+    # A possible danger straight ahead (even a weak one) -> confirm with the large model
+    if np.any(in_band & is_danger & (conf >= CONFIDENCE_THRESHOLD - margin)):
+        return "candidate"
+    # Anything sitting on the decision threshold may flip either way
+    if np.any(np.abs(conf - CONFIDENCE_THRESHOLD) < margin):
+        return "low_conf"
+    return None
 
 class DangerEngine:
-    def __init__(self):
+    def __init__(self, tiled=TILED_INFERENCE, cascade=CASCADE_ENABLED):
         print("[System] Initializing Danger Engine (YOLO)...")
-        
+
         # Force download if missing
-        self.model = YOLO('yolov8l.pt') 
-        
+        self.model = YOLO('yolov8l.pt')
+
         # GPU Acceleration Logic
         if USE_GPU and torch.cuda.is_available():
             print(f"[System] ✅ GPU DETECTED: {torch.cuda.get_device_name(0)}")
@@ -17,70 +163,110 @@ class DangerEngine:
         else:
             print("[System] ⚠️ GPU not found or disabled. Using CPU.")
 
-    def analyze(self, frame):
+        # Tiled mode: hi-res center corridor + low-res (and lower-rate) periphery
+        self.tiled = tiled
+        self.frame_count = 0              # Every analyzed frame (cascade: escalated or not)
+        self.periphery_frame = None       # frame_count when periphery_dets were computed
+        self.periphery_dets = np.zeros((0, 6), dtype=np.float32)
+        if self.tiled:
+            print(f"[System] Tiled inference: center up to {TILE_CENTER_IMGSZ}px, "
+                  f"periphery {TILE_PERIPHERY_IMGSZ}px every {TILE_PERIPHERY_INTERVAL} frame(s)")
+
+        # Top-scoring hazards of the last analyze() (for the multi-voice mixer)
+        self.hazards = []
+        self.ready = True  # Same interface as InferenceProcess (always ready in-process)
+
+        # Cascade mode: small model every frame, large model only on escalation
+        self.cascade = cascade
+        self.small_model = None
+        self.cascade_frames = 0
+        self.escalations = {"candidate": 0, "low_conf": 0, "audit": 0}
+        if self.cascade:
+            self.small_model = YOLO(CASCADE_SMALL_MODEL)
+            if USE_GPU and torch.cuda.is_available():
+                self.small_model.to('cuda')
+            print(f"[System] Cascade: {CASCADE_SMALL_MODEL} always-on, large model on escalation")
+
+    def _detect(self, image, imgsz=640, x_offset=0, model=None):
+        """Runs YOLO and returns an (N, 6) [x1, y1, x2, y2, conf, cls] array."""
+        model = model or self.model
+        # stream=True is faster, agnostic=True reduces flickering
+        results = model(image, imgsz=imgsz, verbose=False, stream=True, agnostic_nms=True)
+        chunks = [r.boxes.data.cpu().numpy() for r in results]
+        dets = np.concatenate(chunks) if chunks else np.zeros((0, 6), dtype=np.float32)
+        if x_offset:
+            dets[:, [0, 2]] += x_offset
+        return dets
+
+    def _detect_tiled(self, frame):
+        width = frame.shape[1]
+        left = int(width * TILE_CENTER_BAND[0])
+        right = int(width * TILE_CENTER_BAND[1])
+
+        # Center corridor: native pixels, aspect ratio preserved (letterboxed).
+        # Never upscaled: imgsz is capped at the crop's long side (multiple of 32)
+        crop = frame[:, left:right]
+        native = -(-max(crop.shape[:2]) // 32) * 32
+        center_dets = self._detect(crop, imgsz=min(TILE_CENTER_IMGSZ, native), x_offset=left)
+
+        # Periphery: whole frame at low resolution, refreshed every N frames.
+        # Objects centered in the corridor are owned by the center tile (the
+        # periphery result may be a frame old: stale boxes would smear or ghost).
+        # Age is counted in analyzed frames, so with the cascade (tiles only on
+        # escalation) a periphery older than the interval is always refreshed.
+        if self.periphery_frame is None or self.frame_count - self.periphery_frame >= TILE_PERIPHERY_INTERVAL:
+            dets = self._detect(frame, imgsz=TILE_PERIPHERY_IMGSZ)
+            center_x = (dets[:, 0] + dets[:, 2]) / 2
+            self.periphery_dets = dets[(center_x < left) | (center_x > right)]
+            self.periphery_frame = self.frame_count
+
+        return merge_detections(center_dets, self.periphery_dets)
+
+    def _detect_large(self, frame):
+        if self.tiled:
+            return self._detect_tiled(frame)
+        return self._detect(frame)
+
+    def _detect_cascade(self, frame):
+        small_dets = self._detect(frame, model=self.small_model)
+        reason = escalation_reason(small_dets, frame.shape[1], self.cascade_frames)
+        self.cascade_frames += 1
+        if reason is None:
+            return small_dets
+        self.escalations[reason] += 1
+        return self._detect_large(frame)
+
+    def detect(self, frame):
+        """Raw detections for a frame: (N, 6) [x1, y1, x2, y2, conf, cls] in frame pixels."""
+        self.frame_count += 1
+        if self.cascade:
+            return self._detect_cascade(frame)
+        return self._detect_large(frame)
+
+    @property
+    def escalation_rate(self):
+        return sum(self.escalations.values()) / self.cascade_frames if self.cascade_frames else 0.0
+
+    def report(self):
+        if not self.cascade:
+            return None
+        reasons = ", ".join(f"{k} {v}" for k, v in self.escalations.items())
+        return (f"[Cascade] {self.cascade_frames} frames, escalation rate "
+                f"{self.escalation_rate:.1%} ({reasons})")
+
+    def analyze(self, frame, view_size=None):
         """
         Returns:
             - danger_detected (bool)
             - closest_object (dict or None)
             - detections (list of raw boxes)
+
+        view_size: optional (width, height) to report coordinates in, e.g.
+        the display frame when a native-resolution frame is analyzed.
         """
         # Run inference
-        # stream=True is faster, agnostic=True reduces flickering
-        results = self.model(frame, verbose=False, stream=True, agnostic_nms=True)
-        
+        dets = self.detect(frame)
         height, width = frame.shape[:2]
-        center_zone_start = width * 0.25
-        center_zone_end = width * 0.75
-
-        danger_detected = False
-        danger_label = ""
-        closest_obj = None
-        
-        # [CHANGED] Smart Selection Variables
-        max_score = 0 
-        # High priority classes get a score multiplier
-        PRIORITY = {'person': 2.0, 'car': 3.0, 'truck': 3.5, 'bus': 3.5, 'motorcycle': 2.5, 'bicycle': 2.0}
-
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                cls_id = int(box.cls[0])
-                conf = float(box.conf[0])
-                
-                if conf < CONFIDENCE_THRESHOLD: continue
-
-                # Bounding Box Coords
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                area = (x2 - x1) * (y2 - y1)
-                center_x = (x1 + x2) // 2
-                label = self.model.names[cls_id]
-                
-                # 1. Global Danger Check (Is there ANY danger in front?)
-                if cls_id in DANGER_CLASSES:
-                    # Is it in front of us?
-                    if center_zone_start < center_x < center_zone_end:
-                        danger_detected = True
-                        danger_label = label
-
-                # 2. Smart Object Selection
-                # Formula: Score = Size * ClassPriority * CenterBias
-                
-                # Get priority weight (default 1.0)
-                weight = PRIORITY.get(label, 1.0)
-                
-                # Calculate Center Bias (1.0 = perfectly centered, 0.0 = edge)
-                center_bias = 1.0 - (abs(center_x - (width / 2)) / width)
-                
-                # Final Score
-                score = area * weight * center_bias
-
-                if score > max_score:
-                    max_score = score
-                    closest_obj = {
-                        "center_x": center_x,
-                        "area": area,
-                        "box": (x1, y1, x2, y2),
-                        "label": label
-                    }
-
-        return danger_detected, danger_label, closest_obj
\ No newline at end of file
+        danger_detected, danger_label, closest_obj, self.hazards = score_detections(
+            dets, self.model.names, width, height, view_size)
+        return danger_detected, danger_label, closest_obj
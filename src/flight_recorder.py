@@ -0,0 +1,231 @@
+import cv2
+import numpy as np
+import threading
+import time
+import json
+import mmap
+import os
+import struct
+import sys
+from collections import deque
+from config import (FLIGHT_WINDOW, FLIGHT_THUMB_SIZE, FLIGHT_JPEG_QUALITY,
+                    FLIGHT_DUMP_DIR, FLIGHT_DUMP_COOLDOWN, FLIGHT_POST_TRIGGER)
+
+# Bundle layout: MAGIC | version (u16) | header length (u32) | JSON header | JPEG blob
+# Frame offsets in the header are relative to the start of the JPEG blob,
+# so a reader can mmap the file and decode any frame without loading the rest.
+MAGIC = b"7SFR"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHI")
+
+class FlightRecorder:
+    """
+    Keeps the last FLIGHT_WINDOW seconds of the session in memory:
+    downscaled JPEG frames with the analysis/decision for each, plus audio
+    events (mode changes, spoken text). Nothing touches the disk until a
+    dump is triggered; dumps are written atomically on a background thread.
+    """
+
+    def __init__(self, window=FLIGHT_WINDOW, dump_dir=FLIGHT_DUMP_DIR):
+        self.window = window
+        self.dump_dir = dump_dir
+        self.frames = deque()   # (ts, jpeg_bytes, meta)
+        self.events = deque()   # (ts, kind, data)
+        self.lock = threading.Lock()
+        self.last_auto_dump_time = 0.0  # Cooldown clock: automatic dumps only (manual ones don't count)
+        self.dump_pending = False
+        self.dump_due = 0.0
+        self.pending_since = 0.0
+        self.pending_reason = ""
+        self.dump_count = 0
+
+        # Overhead stats
+        self.record_calls = 0
+        self.record_seconds = 0.0
+        self.buffer_bytes = 0
+
+    def _trim(self, now):
+        cutoff = now - self.window
+        while self.frames and self.frames[0][0] < cutoff:
+            self.buffer_bytes -= len(self.frames.popleft()[1])
+        while self.events and self.events[0][0] < cutoff:
+            self.events.popleft()
+
+    def record_frame(self, frame, analysis, level, pan, coverage):
+        """Called once per main-loop iteration. Memory only."""
+        t0 = time.perf_counter()
+        now = time.time()
+        thumb = cv2.resize(frame, FLIGHT_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        ok, jpg = cv2.imencode('.jpg', thumb, [cv2.IMWRITE_JPEG_QUALITY, FLIGHT_JPEG_QUALITY])
+        if ok:
+            is_danger, danger_label, closest_obj = analysis
+            meta = {
+                "danger": bool(is_danger),
+                "danger_label": danger_label,
+                "closest": closest_obj,
+                "level": level,
+                "pan": round(float(pan), 3),
+                "coverage": round(float(coverage), 4),
+            }
+            data = jpg.tobytes()
+            with self.lock:
+                self.frames.append((now, data, meta))
+                self.buffer_bytes += len(data)
+                self._trim(now)
+        self.record_calls += 1
+        self.record_seconds += time.perf_counter() - t0
+
+    def log_event(self, kind, data):
+        """Audio mode changes, spoken text, triggers..."""
+        now = time.time()
+        with self.lock:
+            self.events.append((now, kind, data))
+            self._trim(now)
+
+    def trigger(self, reason):
+        """
+        Event-driven dump (e.g. CRITICAL alert). The dump waits FLIGHT_POST_TRIGGER
+        seconds so the bundle also holds the aftermath. Automatic dumps are at
+        least FLIGHT_DUMP_COOLDOWN apart: a trigger during the cooldown or while
+        a dump is pending pushes that dump out (so it gets its aftermath too)
+        instead of being dropped.
+        """
+        with self.lock:
+            now = time.time()
+            due = max(now + FLIGHT_POST_TRIGGER, self.last_auto_dump_time + FLIGHT_DUMP_COOLDOWN)
+            start_timer = not self.dump_pending
+            if start_timer:
+                self.dump_pending = True
+                self.pending_since = now
+                self.pending_reason = reason
+                self.dump_due = due
+            else:
+                # Never so late that the first trigger's lead-up leaves the window
+                self.dump_due = min(max(self.dump_due, due), self.pending_since + self.window / 2)
+        self.log_event("trigger", reason)
+        if start_timer:
+            self._arm(due - now)
+
+    def _arm(self, delay):
+        timer = threading.Timer(max(0.0, delay), self._timed_dump)
+        timer.daemon = True
+        timer.start()
+
+    def _timed_dump(self):
+        with self.lock:
+            remaining = self.dump_due - time.time()
+            if remaining <= 0:
+                self.dump_pending = False
+                self.last_auto_dump_time = time.time()
+                self._dump_locked(self.pending_reason)
+                return
+        self._arm(remaining)  # Deadline was extended by a later trigger
+
+    def dump(self, reason="manual"):
+        """Snapshots the ring buffer and writes the bundle off-thread. Returns the path."""
+        with self.lock:
+            return self._dump_locked(reason)
+
+    def _dump_locked(self, reason):
+        frames = list(self.frames)
+        events = list(self.events)
+        created = time.time()
+        self.dump_count += 1
+        seq = self.dump_count
+
+        # Millisecond stamp + sequence number: same-second dumps never collide
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(created))
+        path = os.path.join(self.dump_dir, f"flight_{stamp}-{int(created * 1000) % 1000:03d}_{seq:03d}_{reason}.7sfr")
+        threading.Thread(target=self._write_bundle, args=(path, frames, events, reason, created), daemon=True).start()
+        return path
+
+    def _write_bundle(self, path, frames, events, reason, created):
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            index = []
+            offset = 0
+            for ts, data, meta in frames:
+                index.append({"t": ts, "offset": offset, "length": len(data), **meta})
+                offset += len(data)
+            header = json.dumps({
+                "reason": reason,
+                "created": created,
+                "thumb_size": list(FLIGHT_THUMB_SIZE),
+                "frames": index,
+                "events": [{"t": ts, "kind": kind, "data": data} for ts, kind, data in events],
+            }, separators=(",", ":")).encode("utf-8")
+
+            # Atomic: readers only ever see a complete bundle
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+                f.write(header)
+                for _, data, _ in frames:
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            print(f"[Recorder] Dumped {len(frames)} frames / {len(events)} events -> {path}")
+        except Exception as e:
+            print(f"[Recorder] Dump failed: {e}")
+
+    def report(self):
+        avg_us = 1e6 * self.record_seconds / self.record_calls if self.record_calls else 0.0
+        return (f"[Recorder] {len(self.frames)} frames buffered, {self.buffer_bytes / 1024:.0f} KiB, "
+                f"avg record cost {avg_us:.0f} us/frame")
+
+class FlightBundle:
+    """Replay reader: mmaps a bundle and decodes frames on demand."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = PREAMBLE.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a flight recorder bundle: {path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported bundle version {version}")
+        self.blob_start = PREAMBLE.size + header_len
+        self.header = json.loads(self.mm[PREAMBLE.size:self.blob_start])
+        self.frames = self.header["frames"]
+        self.events = self.header["events"]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, i):
+        entry = self.frames[i]
+        start = self.blob_start + entry["offset"]
+        data = np.frombuffer(self.mm, dtype=np.uint8, count=entry["length"], offset=start)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def __iter__(self):
+        for i, entry in enumerate(self.frames):
+            yield entry, self.frame(i)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+def replay(path):
+    """Steps through a bundle: frames with decision overlay, events on stdout."""
+    bundle = FlightBundle(path)
+    print(f"[Replay] {path}: reason={bundle.header['reason']}, {len(bundle)} frames")
+    events = deque(bundle.events)
+    for entry, img in bundle:
+        while events and events[0]["t"] <= entry["t"]:
+            ev = events.popleft()
+            print(f"  {ev['t']:.3f} {ev['kind']}: {ev['data']}")
+        view = cv2.resize(img, (480, 480), interpolation=cv2.INTER_NEAREST)
+        text = f"{entry['level']} pan={entry['pan']:+.2f} cov={entry['coverage']:.2f}"
+        cv2.putText(view, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        cv2.imshow("Flight Replay", view)
+        if cv2.waitKey(66) & 0xFF == ord('q'): break
+    bundle.close()
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python flight_recorder.py <bundle.7sfr>")
+    else:
+        replay(sys.argv[1])
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+from collections import defaultdict
+from config import GAZETTEER_PATH, GAZETTEER_MIN_SCORE
+
+STOPWORDS = {"the", "a", "an", "to", "please"}
+
+def normalize(text):
+    """'Take me to The Library!' style noise -> 'library'."""
+    words = re.sub(r'[^\w\s]', ' ', text.lower()).split()
+    return " ".join(w for w in words if w not in STOPWORDS)
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, giving up (returns limit + 1) once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+def word_similarity(a, b):
+    """1.0 for the same word, 1 - d/len for a small typo ('libary'), else 0.0."""
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    limit = (longest - 1) // 5  # Short words must match exactly ('home' != 'hope')
+    if limit == 0:
+        return 0.0
+    dist = edit_distance(a, b, limit)
+    return 1 - dist / longest if dist <= limit else 0.0
+
+def match_score(query_words, key_words):
+    """
+    Every query word must match a distinct word of the key; extra key words
+    are fine ('library' -> 'city central library'), extra query words are
+    not ('home depot' is not 'home'). Returns (mean word similarity, share
+    of the key covered), or (0.0, 0.0) if some query word has no match.
+    """
+    if len(query_words) > len(key_words):
+        return 0.0, 0.0
+    used = set()
+    total = 0.0
+    for q in query_words:
+        best, best_j = 0.0, None
+        for j, k in enumerate(key_words):
+            if j in used: continue
+            sim = word_similarity(q, k)
+            if sim > best:
+                best, best_j = sim, j
+        if best_j is None:
+            return 0.0, 0.0
+        used.add(best_j)
+        total += best
+    return total / len(query_words), len(query_words) / len(key_words)
+
+class Gazetteer:
+    """
+    Saved and frequently visited places with an in-memory fuzzy index.
+
+    On-disk format (GAZETTEER_PATH), one place per line, tab separated:
+        name  lon  lat  visits  alias1|alias2
+    Lookups go through a trigram index to a handful of candidates, which
+    are then matched word by word (whole words, small typos allowed).
+    """
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.path = path
+        self.places = []                  # [name, (lon, lat), visits, aliases]
+        self.keys = {}                    # normalized name/alias -> place index
+        self.index = defaultdict(set)     # trigram -> normalized keys
+        self.lock = threading.Lock()
+        self.unparsed = []                # Malformed lines, written back untouched
+        self.writable = True              # False if the file could not be read
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for lineno, line in enumerate(f, 1):
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) < 3 or line.startswith("#"): continue
+                    try:
+                        name, lon, lat = parts[0], float(parts[1]), float(parts[2])
+                        visits = int(parts[3]) if len(parts) > 3 and parts[3] else 0
+                    except ValueError as e:
+                        # Kept verbatim so the next save() doesn't destroy it
+                        print(f"[Nav] Gazetteer line {lineno} skipped: {e}")
+                        self.unparsed.append(line if line.endswith("\n") else line + "\n")
+                        continue
+                    aliases = [a for a in parts[4].split("|") if a] if len(parts) > 4 else []
+                    self._insert(name, (lon, lat), visits, aliases)
+            print(f"[Nav] Gazetteer loaded: {len(self.places)} places.")
+        except (OSError, UnicodeDecodeError) as e:
+            # Partial view of the file: never overwrite it
+            self.writable = False
+            print(f"[Nav] Gazetteer load error (read-only this session): {e}")
+
+    def save(self):
+        """Atomic rewrite (temp file + rename)."""
+        if not self.writable:
+            return
+        with self.lock:
+            lines = [f"{name}\t{lon:.6f}\t{lat:.6f}\t{visits}\t{'|'.join(aliases)}\n"
+                     for name, (lon, lat), visits, aliases in self.places]
+            lines += self.unparsed
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp, self.path)
+
+    def _insert(self, name, coords, visits, aliases):
+        idx = len(self.places)
+        self.places.append([name, coords, visits, aliases])
+        for key in [name] + aliases:
+            key = normalize(key)
+            if not key: continue
+            self.keys[key] = idx
+            for gram in trigrams(key):
+                self.index[gram].add(key)
+
+    def add(self, name, coords, alias=None):
+        """Records a visit (remote geocode hit or saved place); persists to disk."""
+        with self.lock:
+            idx = self.keys.get(normalize(name))
+            if idx is None:
+                self._insert(name, tuple(coords), 1, [alias] if alias else [])
+            else:
+                place = self.places[idx]
+                place[2] += 1
+                if alias and normalize(alias) not in self.keys:
+                    place[3].append(alias)
+                    self._insert_alias(idx, alias)
+        try:
+            self.save()
+        except OSError as e:
+            print(f"[Nav] Gazetteer save error: {e}")
+
+    def _insert_alias(self, idx, alias):
+        key = normalize(alias)
+        self.keys[key] = idx
+        for gram in trigrams(key):
+            self.index[gram].add(key)
+
+    def lookup(self, text, min_score=GAZETTEER_MIN_SCORE):
+        """Returns (name, (lon, lat)) for the best fuzzy match, or None."""
+        query = normalize(text)
+        if len(query) < 3:
+            return None
+
+        with self.lock:
+            if query in self.keys:
+                place = self.places[self.keys[query]]
+                return place[0], place[1]
+
+            # 1. Candidates sharing trigrams
+            counts = defaultdict(int)
+            for gram in trigrams(query):
+                for key in self.index.get(gram, ()):
+                    counts[key] += 1
+            candidates = sorted(counts, key=counts.get, reverse=True)[:20]
+
+            # 2. Word-level match; ties go to the most visited place, then the better-covered key
+            query_words = query.split()
+            best, best_rank, best_score = None, None, 0.0
+            for key in candidates:
+                score, coverage = match_score(query_words, key.split())
+                place = self.places[self.keys[key]]
+                rank = (score, place[2], coverage)
+                if score > 0 and (best_rank is None or rank > best_rank):
+                    best, best_rank, best_score = place, rank, score
+
+        if best is None or best_score < min_score:
+            return None
+        return best[0], best[1]
@@ -0,0 +1,84 @@
+import cv2
+import time
+from config import (BRIGHTNESS_TRIGGER, GESTURE_RELEASE_MARGIN, GESTURE_HOLD_DURATION,
+                    GESTURE_COOLDOWN, GESTURE_THUMB_SIZE)
+
+class CoverGestureDetector:
+    """
+    Cover-the-camera trigger as a non-blocking state machine, fed by the
+    capture thread with every frame:
+
+        IDLE --dark--> COVERED --held GESTURE_HOLD_DURATION--> ARMED (on_ready)
+        ARMED --light--> IDLE (on_trigger)          COVERED --light--> IDLE
+
+    Luminance comes from a tiny grayscale thumbnail, so the cost per frame
+    is negligible. Callbacks run on the capture thread and must not block.
+    on_ready() returns whether the "Ready." prompt was accepted; the
+    speech layer calls prompt_started() once it is actually playing.
+    """
+
+    IDLE, COVERED, ARMED = "idle", "covered", "armed"
+
+    def __init__(self, on_ready, on_trigger):
+        self.on_ready = on_ready
+        self.on_trigger = on_trigger
+        self.state = self.IDLE
+        self.dark_since = 0.0
+        self.last_trigger_time = 0.0
+
+        # Latency: hold condition met -> "Ready." starts playing
+        self.armed_at = 0.0
+        self.trigger_count = 0
+        self.prompts_dropped = 0
+        self.ready_count = 0
+        self.ready_latency_total = 0.0
+        self.ready_latency_max = 0.0
+
+    def luminance(self, frame):
+        thumb = cv2.resize(frame, GESTURE_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        return float(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY).mean())
+
+    def process(self, frame):
+        now = time.time()
+        luma = self.luminance(frame)
+        dark = luma < BRIGHTNESS_TRIGGER
+        light = luma > BRIGHTNESS_TRIGGER + GESTURE_RELEASE_MARGIN
+
+        if self.state == self.IDLE:
+            if dark and now - self.last_trigger_time > GESTURE_COOLDOWN:
+                self.state = self.COVERED
+                self.dark_since = now
+
+        elif self.state == self.COVERED:
+            if light:
+                self.state = self.IDLE
+            elif now - self.dark_since > GESTURE_HOLD_DURATION:
+                self.state = self.ARMED
+                self.armed_at = self.dark_since + GESTURE_HOLD_DURATION
+                if self.on_ready() is False:
+                    self.prompts_dropped += 1
+
+        elif self.state == self.ARMED:
+            if light:
+                self.state = self.IDLE
+                self.last_trigger_time = now
+                self.trigger_count += 1
+                self.on_trigger()
+
+    def prompt_started(self):
+        """Speech-layer callback: "Ready." is now audible."""
+        latency = time.time() - self.armed_at
+        self.ready_count += 1
+        self.ready_latency_total += latency
+        self.ready_latency_max = max(self.ready_latency_max, latency)
+
+    def report(self):
+        if not self.trigger_count and not self.ready_count:
+            return "[Gesture] No triggers this session."
+        summary = (f"[Gesture] {self.trigger_count} trigger(s), 'Ready.' played {self.ready_count}, "
+                   f"dropped {self.prompts_dropped}")
+        if not self.ready_count:
+            return summary
+        avg = self.ready_latency_total / self.ready_count
+        return (f"{summary}, hold-to-'Ready.' latency "
+                f"avg {avg * 1000:.0f} ms, max {self.ready_latency_max * 1000:.0f} ms")
@@ -0,0 +1,177 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+import time
+from danger_engine import score_detections
+from config import (TILED_INFERENCE, INFERENCE_MAX_FRAME, INFERENCE_MAX_DETECTIONS,
+                    INFERENCE_TIMEOUT, INFERENCE_RESTART_BACKOFF)
+
+# Shared memory layout (created by the client, attached by the worker):
+#   frames:  2 slots x (H*W*3) uint8   -- frame in, one memcpy, never pickled
+#   results: 2 slots x MAX_DETS x 6 float32 [x1, y1, x2, y2, conf, cls]
+# The pipe only carries tiny control tuples (seq, slot, shape, count).
+FRAME_SLOT_BYTES = INFERENCE_MAX_FRAME[0] * INFERENCE_MAX_FRAME[1] * 3
+
+def _worker_main(conn, frames_name, results_name, tiled):
+    """Worker process entry point: owns YOLO (and its GIL) exclusively."""
+    from danger_engine import DangerEngine
+
+    # Spawned children share the client's resource tracker, which owns (and unlinks) these
+    frames_shm = shared_memory.SharedMemory(name=frames_name)
+    results_shm = shared_memory.SharedMemory(name=results_name)
+    frames = np.ndarray((2, FRAME_SLOT_BYTES), dtype=np.uint8, buffer=frames_shm.buf)
+    results = np.ndarray((2, INFERENCE_MAX_DETECTIONS, 6), dtype=np.float32, buffer=results_shm.buf)
+
+    engine = DangerEngine(tiled=tiled)
+    engine.detect(np.zeros((640, 640, 3), dtype=np.uint8))  # Warm-up before declaring ready
+    conn.send(("ready", dict(engine.model.names)))
+
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None: break
+            _, seq, slot, h, w = msg
+            frame = frames[slot, :h * w * 3].reshape(h, w, 3)
+            dets = engine.detect(frame)
+            n = min(len(dets), INFERENCE_MAX_DETECTIONS)
+            results[slot, :n] = dets[:n]
+            conn.send(("result", seq, slot, n))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del frames, results
+        frames_shm.close()
+        results_shm.close()
+
+class InferenceProcess:
+    """
+    Drop-in for DangerEngine that runs YOLO in a dedicated process, so
+    inference no longer competes for the GIL with capture, GUI, TTS and
+    the audio callback. Scoring stays here (it is cheap and needs no model).
+
+    Supervision: a dead or hung worker is restarted in the background;
+    meanwhile analyze() returns an empty result instead of raising, so the
+    alerting loop keeps running. `ready` is False while the worker loads
+    (startup and every restart): hazards are NOT being detected, and the
+    caller must tell the user.
+    """
+
+    def __init__(self, tiled=TILED_INFERENCE):
+        self.tiled = tiled
+        self.hazards = []
+        self.names = {}
+        self.ready = False
+        self.seq = 0
+        self.restarts = 0
+        self.last_restart_time = 0.0
+        self.ctx = mp.get_context("spawn")  # Safe with CUDA
+
+        self.frames_shm = shared_memory.SharedMemory(create=True, size=2 * FRAME_SLOT_BYTES)
+        self.results_shm = shared_memory.SharedMemory(create=True, size=2 * INFERENCE_MAX_DETECTIONS * 6 * 4)
+        self.frames = np.ndarray((2, FRAME_SLOT_BYTES), dtype=np.uint8, buffer=self.frames_shm.buf)
+        self.results = np.ndarray((2, INFERENCE_MAX_DETECTIONS, 6), dtype=np.float32, buffer=self.results_shm.buf)
+
+        self.proc = None
+        self.conn = None
+        self._spawn()
+
+    def _spawn(self):
+        parent_conn, child_conn = self.ctx.Pipe()
+        self.proc = self.ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.frames_shm.name, self.results_shm.name, self.tiled),
+            daemon=True
+        )
+        self.proc.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.ready = False
+        self.last_restart_time = time.time()
+        print(f"[Supervisor] Inference worker started (pid {self.proc.pid})")
+
+    def _restart(self, reason):
+        if time.time() - self.last_restart_time < INFERENCE_RESTART_BACKOFF:
+            return
+        print(f"[Supervisor] Restarting inference worker: {reason}")
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.proc.join(timeout=1.0)
+        self.conn.close()
+        self.restarts += 1
+        self._spawn()
+
+    def _supervise(self):
+        if not self.proc.is_alive():
+            self._restart(f"exited with code {self.proc.exitcode}")
+            return
+        if not self.ready and self.conn.poll(0):
+            try:
+                kind, names = self.conn.recv()
+            except (EOFError, OSError):
+                return
+            if kind == "ready":
+                self.names = names
+                self.ready = True
+                print("[Supervisor] Inference worker ready.")
+
+    def _empty_result(self):
+        self.hazards = []
+        return False, "", None
+
+    def analyze(self, frame, view_size=None):
+        """Same contract as DangerEngine.analyze."""
+        self._supervise()
+        if not self.ready:
+            return self._empty_result()
+
+        height, width = frame.shape[:2]
+        max_h, max_w = INFERENCE_MAX_FRAME
+        if height > max_h or width > max_w:
+            # Shrink to fit the slot; scoring maps back to the caller's size
+            scale = min(max_h / height, max_w / width)
+            view_size = view_size or (width, height)
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)))
+            height, width = frame.shape[:2]
+
+        # Double buffer: never overwrite the slot a slow/old request may still read
+        self.seq += 1
+        seq, slot = self.seq, self.seq % 2
+        np.copyto(self.frames[slot, :height * width * 3].reshape(height, width, 3), frame)
+
+        try:
+            self.conn.send(("frame", seq, slot, height, width))
+            deadline = time.time() + INFERENCE_TIMEOUT
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.conn.poll(remaining):
+                    self._restart(f"no result within {INFERENCE_TIMEOUT:.1f}s")
+                    return self._empty_result()
+                msg = self.conn.recv()
+                if msg[0] == "result" and msg[1] == seq:
+                    n = msg[3]
+                    break
+                # Results for superseded requests are dropped
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self._restart(f"pipe error: {e}")
+            return self._empty_result()
+
+        dets = self.results[slot, :n].copy()
+        danger_detected, danger_label, closest_obj, self.hazards = score_detections(
+            dets, self.names, width, height, view_size)
+        return danger_detected, danger_label, closest_obj
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.proc.join(timeout=2.0)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        del self.frames, self.results
+        self.frames_shm.close()
+        self.frames_shm.unlink()
+        self.results_shm.close()
+        self.results_shm.unlink()
+        print(f"[Supervisor] Inference worker stopped ({self.restarts} restart(s)).")
@@ -3,72 +3,229 @@ import time
 import numpy as np
 import pyaudio
 import wave
-import os
+import io
+import threading
 import re  # Essential for cleaning Gemini timestamps
+import asyncio
 
 from vision_stream import VisionStream
 from danger_engine import DangerEngine
+from inference_worker import InferenceProcess
 from audio_manager import AudioManager
 from context_engine import ContextEngine
 from navigation_engine import NavigationEngine 
-from config import BRIGHTNESS_TRIGGER, ORS_API_KEY
+from service_layer import ServiceLayer
+from scene_gate import SceneChangeGate
+from flight_recorder import FlightRecorder
+from gesture_trigger import CoverGestureDetector
+from config import (ORS_API_KEY, VOICE_DEADLINE, VOICE_SINGLE_ROUNDTRIP, SCENE_GATE_ENABLED, SCENE_REPORT_INTERVAL,
+                    INFERENCE_ISOLATED, BRIGHTNESS_TRIGGER, GESTURE_RELEASE_MARGIN, GESTURE_THUMB_SIZE,
+                    VOICE_FRAME_SETTLE_TIMEOUT, VOICE_FRAME_SETTLE_DELTA, VOICE_FRAME_SETTLE_INTERVAL)
 
 # --- AUDIO RECORDING CONFIG ---
 CHUNK = 1024
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 44100
-WAVE_OUTPUT_FILENAME = "user_query.wav"
+MIC_LOCK = threading.Lock()  # One capture at a time (a superseded one releases within a chunk)
 
-def record_audio_input():
+def record_audio_input(stop_event=None):
     """
     Records audio until silence is detected OR a timeout is reached.
+    Returns the recording as in-memory WAV bytes (None if nothing was said).
+    stop_event: set it to abandon the recording (e.g. the job was superseded).
     """
-    p = pyaudio.PyAudio()
     THRESHOLD = 600       
     SILENCE_LIMIT = 1.2   
     MAX_DURATION = 10.0   
     
+    with MIC_LOCK:
+        p = pyaudio.PyAudio()
+        try:
+            stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
+            print("[System] Listening... (Speak now)")
+            frames = []
+            start_time = time.time()
+            last_sound_time = time.time()
+            speech_started = False
+            
+            while not (stop_event and stop_event.is_set()):
+                data = stream.read(CHUNK, exception_on_overflow=False)
+                frames.append(data)
+                audio_data = np.frombuffer(data, dtype=np.int16)
+                volume = np.abs(audio_data).mean()
+                current_time = time.time()
+                total_duration = current_time - start_time
+                
+                if volume > THRESHOLD:
+                    last_sound_time = current_time
+                    if not speech_started: speech_started = True
+                if speech_started and (current_time - last_sound_time > SILENCE_LIMIT): break
+                if total_duration > MAX_DURATION: break
+                if not speech_started and total_duration > 4.0: break
+
+            stream.stop_stream()
+            stream.close()
+            
+            if stop_event and stop_event.is_set():
+                print("[System] Recording abandoned.")
+                return None
+            if len(frames) > 0 and speech_started:
+                buf = io.BytesIO()
+                with wave.open(buf, 'wb') as wf:
+                    wf.setnchannels(CHANNELS)
+                    wf.setsampwidth(p.get_sample_size(FORMAT))
+                    wf.setframerate(RATE)
+                    wf.writeframes(b''.join(frames))
+                return buf.getvalue()
+            return None
+
+        except Exception as e:
+            print(f"[Audio Error] {e}")
+            return None
+        finally:
+            p.terminate()
+
+def clean_transcript(user_q):
+    """Strips Gemini transcription artifacts and normalizes to lowercase words."""
+    # --- AGGRESSIVE TEXT CLEANING ---
+    # 1. Remove [Brackets]
+    clean_q = re.sub(r'\[.*?\]', '', user_q)
+    # 2. Remove Timestamps (00:00 or 00:00:00)
+    clean_q = re.sub(r'\b\d{2}:\d{2}\b', '', clean_q)
+    clean_q = re.sub(r'\b\d{2}:\d{2}:\d{2}\b', '', clean_q)
+    # 3. Remove "0000" artifacts
+    clean_q = re.sub(r'\b0+\b', '', clean_q)
+    # 4. Standard clean
+    clean_q = re.sub(r'[^\w\s]', '', clean_q).strip().lower()
+    # 5. Fix spaces
+    return re.sub(r'\s+', ' ', clean_q)
+
+async def handle_voice_query(services, audio, vision, context_ai, nav_engine):
+    """
+    One voice interaction, run on the service loop so the safety loop
+    keeps analyzing frames while we record, transcribe and route.
+    """
+    audio.speak("Listening.")
+    stop_recording = threading.Event()
     try:
-        stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
-        print("[System] Listening... (Speak now)")
-        frames = []
-        start_time = time.time()
-        last_sound_time = time.time()
-        speech_started = False
+        # Device I/O on the I/O pool (pyaudio read loop is blocking)
+        audio_bytes = await services.run_blocking(record_audio_input, stop_recording)
+        target_frame = vision.read() 
+        audio.speak("Thinking.")
         
-        while True:
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            frames.append(data)
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            volume = np.abs(audio_data).mean()
-            current_time = time.time()
-            total_duration = current_time - start_time
+        if not audio_bytes:
+            if target_frame is not None:
+                context_ai.describe_scene(target_frame)
+            return
+        if target_frame is None: return
+
+        user_q = await context_ai.transcribe_audio(audio_bytes)
+        print(f"[User Asked Raw] {user_q}")
+
+        if not user_q:
+            context_ai.describe_scene(target_frame)
+            return
+
+        clean_q = clean_transcript(user_q)
+        print(f"[Cleaned Command] {clean_q}")
+
+        if len(clean_q) <= 2:
+            context_ai.describe_scene(target_frame)
+            return
+
+        # --- ROUTER LOGIC ---
+        if "take me to" in clean_q or "navigate to" in clean_q:
+            dest = clean_q.replace("take me to", "").replace("navigate to", "").strip()
             
-            if volume > THRESHOLD:
-                last_sound_time = current_time
-                if not speech_started: speech_started = True
-            if speech_started and (current_time - last_sound_time > SILENCE_LIMIT): break
-            if total_duration > MAX_DURATION: break
-            if not speech_started and total_duration > 4.0: break
-
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        
-        if len(frames) > 0 and speech_started:
-            wf = wave.open(WAVE_OUTPUT_FILENAME, 'wb')
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(p.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b''.join(frames))
-            wf.close()
-            return True
-        return False
-
-    except Exception as e:
-        print(f"[Audio Error] {e}")
-        return False
+            if len(dest) > 2:
+                await start_route(audio, nav_engine, dest)
+            else:
+                audio.speak("Destination not understood.")
+        else:
+            context_ai.answer_question(target_frame, user_q)
+    finally:
+        # Superseded / timed out: the pool thread can't be cancelled, so tell it to stop
+        stop_recording.set()
+
+async def start_route(audio, nav_engine, dest):
+    audio.speak(f"Calculating route to {dest}")
+    # Use "Current Location" string, Map Engine handles the coordinates
+    msg = await nav_engine.calculate_route_async("Current Location", dest)
+    audio.speak(msg)
+    
+    # Speak first instruction once the route message is out
+    await asyncio.sleep(3.0)
+    first_step = nav_engine.get_next_instruction()
+    if first_step: audio.speak(first_step)
+
+async def capture_settled_frame(vision):
+    """
+    The first light frame after the hand leaves the lens is usually blurred,
+    partly covered or mid auto-exposure: wait (bounded) until luminance is
+    bright and stops changing, then return that frame.
+    """
+    deadline = time.time() + VOICE_FRAME_SETTLE_TIMEOUT
+    last_luma, frame = None, None
+    while time.time() < deadline:
+        frame = vision.read()
+        if frame is not None:
+            thumb = cv2.resize(frame, GESTURE_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+            luma = float(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY).mean())
+            bright = luma > BRIGHTNESS_TRIGGER + GESTURE_RELEASE_MARGIN
+            if bright and last_luma is not None and abs(luma - last_luma) < VOICE_FRAME_SETTLE_DELTA:
+                return frame
+            last_luma = luma
+        await asyncio.sleep(VOICE_FRAME_SETTLE_INTERVAL)
+    return frame
+
+async def handle_voice_query_combined(services, audio, vision, context_ai, nav_engine):
+    """
+    Single round trip: the frame is encoded and uploaded while the user is
+    still speaking, then audio + frame go out in one request that returns
+    the intent and the answer together.
+    """
+    audio.speak("Listening.")
+    stop_recording = threading.Event()
+    recording = asyncio.ensure_future(services.run_blocking(record_audio_input, stop_recording))
+    upload = None
+    try:
+        # Still speculative: the settled frame is uploaded during recording
+        target_frame = await capture_settled_frame(vision)
+        if target_frame is None: return
+        upload = asyncio.ensure_future(context_ai.prepare_frame(target_frame))
+
+        audio_bytes = await recording
+        if not audio_bytes:
+            context_ai.describe_scene(target_frame)
+            return
+        audio.speak("Thinking.")
+
+        image_part, _ = await asyncio.shield(upload)  # Cancellation must not orphan the upload
+        try:
+            result = await context_ai.voice_query(audio_bytes, image_part)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Voice QA Error] {e!r}")
+            audio.speak("Service error.")
+            return
+        print(f"[Voice Intent] {result}")
+
+        if result["intent"] == "navigate":
+            dest = clean_transcript(result["destination"])
+            if len(dest) > 2:
+                await start_route(audio, nav_engine, dest)
+            else:
+                audio.speak("Destination not understood.")
+        elif result["answer"]:
+            context_ai.tts(result["answer"])
+        else:
+            context_ai.describe_scene(target_frame)
+    finally:
+        stop_recording.set()
+        # Not cancelled: the upload may already be server-side; delete it once it lands
+        if upload is not None: context_ai.discard_frame(upload)
 
 def main():
     print("[Init] Starting Vision Stream...")
@@ -76,133 +233,89 @@ def main():
     time.sleep(1.0) 
 
     print("[Init] Loading Engines...")
-    danger_ai = DangerEngine()
-    audio = AudioManager()
+    # Isolated: YOLO runs in a supervised worker process (no GIL contention)
+    danger_ai = InferenceProcess() if INFERENCE_ISOLATED else DangerEngine()
+    scene_gate = SceneChangeGate() if SCENE_GATE_ENABLED else None
+    recorder = FlightRecorder()
+    audio = AudioManager(recorder=recorder)
     audio.start()
     
-    context_ai = ContextEngine(tts_callback=audio.speak)
-    nav_engine = NavigationEngine(api_key=ORS_API_KEY)
+    services = ServiceLayer().start()
+    context_ai = ContextEngine(tts_callback=audio.speak, services=services)
+    nav_engine = NavigationEngine(api_key=ORS_API_KEY, services=services)
 
     print("\n=== SIXTHSENSE ONLINE ===")
     audio.speak("System Online.")
 
+    # ==================================================
+    # 1. CONTEXT TRIGGER (ROUTER) -- event driven from the capture thread
+    # ==================================================
+    def on_gesture_ready():
+        audio.silence()
+        # Latency is measured to when "Ready." actually starts playing
+        return audio.speak("Ready.", on_start=gesture.prompt_started)
+
+    def on_gesture_trigger():
+        # Record -> transcribe -> route runs on the service loop;
+        # a new trigger supersedes an interaction still in flight.
+        handler = handle_voice_query_combined if VOICE_SINGLE_ROUNDTRIP else handle_voice_query
+        services.submit(
+            "voice",
+            lambda: handler(services, audio, vision, context_ai, nav_engine),
+            deadline=VOICE_DEADLINE
+        )
+
+    gesture = CoverGestureDetector(on_ready=on_gesture_ready, on_trigger=on_gesture_trigger)
+    vision.gesture = gesture
+
     last_danger_time = 0
     DANGER_HOLD_DURATION = 1.0 
-    darkness_start_time = 0
-    is_dark_state = False
-    TRIGGER_DURATION = 2.0 
+    last_analysis = (False, "", None)
+    in_danger_mode = False
+    last_report_time = time.time()
+    detector_ready = True   # Last announced state of the hazard detector
+    pending_status = None   # Announcement still waiting for the speech channel
+
+    last_frame_id = 0
 
     try:
         while True:
-            frame = vision.read()
-            if frame is None: continue
+            # Paced by the camera: never re-analyze / re-record the same frame
+            frame, frame_id = vision.read_new(last_frame_id)
+            if frame is None or frame_id == last_frame_id: continue
+            last_frame_id = frame_id
 
             inf_frame = cv2.resize(frame, (640, 640))
             height, width = inf_frame.shape[:2]
 
             # ==================================================
-            # 1. CONTEXT TRIGGER (ROUTER)
+            # 2. MULTI-LAYER SAFETY & GUIDANCE
             # ==================================================
-            gray_avg = np.mean(cv2.cvtColor(inf_frame, cv2.COLOR_BGR2GRAY))
             
-            if gray_avg < BRIGHTNESS_TRIGGER:
-                if not is_dark_state:
-                    darkness_start_time = time.time()
-                    is_dark_state = True
-                
-                elapsed = time.time() - darkness_start_time
-                
-                if elapsed > TRIGGER_DURATION:
-                    # --- TRIGGER ACTIVATED ---
-                    audio.silence()
-                    audio.speak("Ready.")
-                    
-                    while True:
-                        temp = vision.read()
-                        if temp is None: continue
-                        if np.mean(cv2.cvtColor(temp, cv2.COLOR_BGR2GRAY)) > BRIGHTNESS_TRIGGER:
-                            break
-                        time.sleep(0.05)
-                    
-                    audio.speak("Listening.")
-                    success = record_audio_input()
-                    target_frame = vision.read() 
-                    audio.speak("Thinking.")
-                    
-                    if success and target_frame is not None:
-                        user_q = context_ai.transcribe_audio(WAVE_OUTPUT_FILENAME)
-                        print(f"[User Asked Raw] {user_q}")
-
-                        if user_q:
-                            # --- AGGRESSIVE TEXT CLEANING ---
-                            # 1. Remove [Brackets]
-                            clean_q = re.sub(r'\[.*?\]', '', user_q)
-                            # 2. Remove Timestamps (00:00 or 00:00:00)
-                            clean_q = re.sub(r'\b\d{2}:\d{2}\b', '', clean_q)
-                            clean_q = re.sub(r'\b\d{2}:\d{2}:\d{2}\b', '', clean_q)
-                            # 3. Remove "0000" artifacts
-                            clean_q = re.sub(r'\b0+\b', '', clean_q)
-                            # 4. Standard clean
-                            clean_q = re.sub(r'[^\w\s]', '', clean_q).strip().lower()
-                            # 5. Fix spaces
-                            clean_q = re.sub(r'\s+', ' ', clean_q)
-
-                            print(f"[Cleaned Command] {clean_q}")
-
-                            if len(clean_q) > 2:
-                                # --- ROUTER LOGIC ---
-                                if "take me to" in clean_q or "navigate to" in clean_q:
-                                    dest = clean_q.replace("take me to", "").replace("navigate to", "").strip()
-                                    
-                                    if len(dest) > 2:
-                                        audio.speak(f"Calculating route to {dest}")
-                                        # Use "Current Location" string, Map Engine handles the coordinates
-                                        msg = nav_engine.calculate_route("Current Location", dest)
-                                        audio.speak(msg)
-                                        
-                                        # Speak first instruction immediately
-                                        time.sleep(3.0)
-                                        first_step = nav_engine.get_next_instruction()
-                                        if first_step: audio.speak(first_step)
-                                    else:
-                                        audio.speak("Destination not understood.")
-                                else:
-                                    context_ai.answer_question(target_frame, user_q)
-                            else:
-                                context_ai.describe_scene(target_frame)
-                        else:
-                            context_ai.describe_scene(target_frame)
-                    elif target_frame is not None:
-                        context_ai.describe_scene(target_frame)
-                    
-                    is_dark_state = False
-                    darkness_start_time = 0
-                    if os.path.exists(WAVE_OUTPUT_FILENAME):
-                        os.remove(WAVE_OUTPUT_FILENAME)
-                    time.sleep(2.0) 
-                    continue
-            else:
-                is_dark_state = False
-                darkness_start_time = 0
-
-            # ==================================================
-            # 2. PAUSE LOGIC
-            # ==================================================
-            if context_ai.is_busy:
-                cv2.putText(inf_frame, "PAUSED: AI Thinking...", (50, height - 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.imshow("SixthSense Brain", inf_frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'): break
-                time.sleep(0.05) 
-                continue 
+            # LAYER A: YOLO (Critical)
+            # Static scene -> reuse last detections (never while a hazard is active)
+            if scene_gate is None or scene_gate.should_infer(inf_frame, force=in_danger_mode):
+                if danger_ai.tiled:
+                    # Tiles are cut from the native frame (no aspect squash);
+                    # results come back in inf_frame coordinates
+                    last_analysis = danger_ai.analyze(frame, view_size=(width, height))
+                else:
+                    last_analysis = danger_ai.analyze(inf_frame)
+            is_danger, danger_name, closest_obj = last_analysis
 
-            # ==================================================
-            # 3. MULTI-LAYER SAFETY & GUIDANCE
-            # ==================================================
+            # Isolated worker loading / restarting: no hazard detection -> tell the user
+            if danger_ai.ready != detector_ready:
+                detector_ready = danger_ai.ready
+                pending_status = "Hazard detection ready." if detector_ready else "Hazard detection not ready."
+                print(f"[System] {pending_status}")
+            if pending_status and audio.speak(pending_status):
+                pending_status = None
             
-            # LAYER A: YOLO (Critical)
-            is_danger, danger_name, closest_obj = danger_ai.analyze(inf_frame)
+            if scene_gate and time.time() - last_report_time > SCENE_REPORT_INTERVAL:
+                print(scene_gate.report())
+                last_report_time = time.time()
             current_time = time.time()
+            level, pan, coverage = "clear", 0.0, 0.0
             if is_danger: last_danger_time = current_time
             in_danger_mode = (current_time - last_danger_time) < DANGER_HOLD_DURATION
 
@@ -216,12 +329,15 @@ def main():
                 label = danger_name if is_danger else "DANGER"
                 
                 if coverage > 0.35:
+                    level = "critical"
                     audio.set_danger_critical(pan)
                     cv2.putText(inf_frame, f"CRITICAL: {label}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
                 elif coverage > 0.15:
+                    level = "approaching"
                     audio.set_danger_approaching(pan, label)
                     cv2.putText(inf_frame, f"WARNING: {label}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 165, 255), 3)
                 elif coverage > 0.05:
+                    level = "far"
                     audio.set_danger_far(pan)
                     cv2.putText(inf_frame, f"DETECTED: {label}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3)
                 else:
@@ -229,6 +345,7 @@ def main():
 
             # LAYER B: NAVIGATION (Only if Safe)
             elif nav_engine.is_navigating:
+                level = "navigation"
                 nav_msg = nav_engine.get_next_instruction()
                 if nav_msg:
                     audio.speak(nav_msg)
@@ -252,6 +369,7 @@ def main():
                 cv2.rectangle(inf_frame, (x1,y1), (x2,y2), (0,255,0), 2)
 
                 if coverage > 0.35:
+                    level = "proximity"
                     audio.announce_proximity(closest_obj['label'], pan)
                     cv2.putText(inf_frame, f"CLOSE: {closest_obj['label']}", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,0), 2)
                 else:
@@ -259,13 +377,41 @@ def main():
             else:
                 audio.silence()
 
+            # Other hazards (not the primary cue) as simultaneous mixer voices
+            if audio.mixer:
+                audio.set_hazards([
+                    (h['label'], (h['center_x'] - (width/2)) / (width/2), h['area'] / (width * height))
+                    for h in danger_ai.hazards if h is not closest_obj
+                ])
+
+            # In-memory only; dumped on CRITICAL or by pressing 'd'
+            recorder.record_frame(frame, last_analysis, level, pan, coverage)
+
+            # ==================================================
+            # 3. AI STATUS (drawn after inference; YOLO and the gate see the clean frame)
+            # ==================================================
+            if context_ai.is_busy:
+                cv2.putText(inf_frame, "AI Thinking...", (50, height - 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            if not detector_ready:
+                cv2.putText(inf_frame, "HAZARD DETECTION OFFLINE", (50, height - 90),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
             cv2.imshow("SixthSense Brain", inf_frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'): break
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'): break
+            if key == ord('d'): recorder.dump("manual")
 
     except KeyboardInterrupt:
         print("Shutting down...")
     finally:
+        if scene_gate: print(scene_gate.report())
+        print(recorder.report())
+        print(gesture.report())
+        if not INFERENCE_ISOLATED and danger_ai.cascade: print(danger_ai.report())
         vision.stop()
+        if INFERENCE_ISOLATED: danger_ai.stop()
+        services.stop()
         audio.stop()
         cv2.destroyAllWindows()
 
@@ -1,18 +1,29 @@
 import openrouteservice
 from openrouteservice.directions import directions
+import asyncio
 import time
 import cv2
 import numpy as np
-from config import ORS_API_KEY, DEMO_ORIGIN_COORDS
+from gazetteer import Gazetteer
+from config import ORS_API_KEY, ORS_BASE_URL, DEMO_ORIGIN_COORDS, ROUTE_DEADLINE
 
 class NavigationEngine:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, services=None):
         key_to_use = api_key if api_key else ORS_API_KEY
+        self.services = services  # ServiceLayer (async I/O loop), optional
+        self.gazetteer = Gazetteer() # Saved / frequent places, resolved locally
         
         self.client = None
         if key_to_use and len(key_to_use) > 10:
             try:
-                self.client = openrouteservice.Client(key=key_to_use)
+                # Single client = single requests.Session (keep-alive reuse).
+                # Retries are left to the service layer, not the client.
+                self.client = openrouteservice.Client(
+                    key=key_to_use,
+                    base_url=ORS_BASE_URL,
+                    timeout=ROUTE_DEADLINE,
+                    retry_over_query_limit=False
+                )
                 print("[Nav] OpenRouteService Client Loaded.")
             except:
                 print("[Nav] ORS Key invalid. Using Mock Mode.")
@@ -32,61 +43,130 @@ class NavigationEngine:
             "You have arrived."
         ]
 
+    def _local_lookup(self, end_text):
+        """Gazetteer hit as (coords, visit) or None; microseconds, no I/O."""
+        hit = self.gazetteer.lookup(end_text)
+        if not hit:
+            return None
+        print(f"[Nav] Gazetteer hit: '{end_text}' -> {hit[0]}")
+        return hit[1], (hit[0], hit[1], None)
+
+    def _geocode(self, end_text):
+        """Remote geocoding (blocking, retry-safe: no side effects). (coords, visit) or None."""
+        geocode = self.client.pelias_search(text=end_text, focus_point=DEMO_ORIGIN_COORDS)
+
+        if not geocode['features']:
+            return None
+
+        feature = geocode['features'][0]
+        dest_coords = feature['geometry']['coordinates']
+        # Learn it: next time this place (or this phrasing) resolves locally
+        return dest_coords, (feature['properties'].get('label', end_text), dest_coords, end_text)
+
+    def _record_visit(self, visit):
+        """Counts the visit once the route succeeded (frequent places win lookup ties)."""
+        name, coords, alias = visit
+        self.gazetteer.add(name, coords, alias=alias)
+
+    def _fetch_route(self, dest_coords, end_text):
+        """
+        Blocking ORS directions call. Raises on API errors so callers can
+        retry; no side effects.
+        """
+        # Get Walking Directions
+        route = directions(
+            self.client,
+            coordinates=[DEMO_ORIGIN_COORDS, dest_coords],
+            profile='foot-walking',
+            format='geojson'
+        )
+
+        # Parse & Convert to Steps
+        segments = route['features'][0]['properties']['segments']
+        steps = [f"Route calculated. Walking to {end_text}."]
+
+        for segment in segments:
+            for step in segment['steps']:
+                instr = step['instruction']
+                dist_meters = int(step['distance'])
+
+                if dist_meters > 0:
+                    # [LOGIC] 1 Step approx 0.75 meters
+                    steps_count = int(dist_meters / 0.75)
+                    steps.append(f"In {steps_count} steps, {instr}")
+                else:
+                    steps.append(instr)
+
+        steps.append("You have arrived.")
+        return steps
+
+    def _start_route(self, steps, end_text):
+        # Fallback
+        if not steps:
+            print("[Nav] Using Mock Route.")
+            steps = self.mock_route
+
+        self.steps = steps
+        self.current_step_index = 0
+        self.last_update_time = time.time()
+        self.is_navigating = True
+        return f"Navigating to {end_text}."
+
     def calculate_route(self, start_text, end_text):
         """
         Fetches REAL directions and converts distances to STEPS.
+        Blocking; the main loop should use calculate_route_async instead.
         """
         print(f"[Nav] Calculating: {start_text} -> {end_text}")
-        self.steps = []
-        
+        steps = []
+
         if self.client:
             try:
-                # 1. Geocode destination
-                geocode = self.client.pelias_search(text=end_text, focus_point=DEMO_ORIGIN_COORDS)
-                
-                if not geocode['features']:
+                resolved = self._local_lookup(end_text) or self._geocode(end_text)
+                if resolved is None:
                     return f"Could not find location: {end_text}"
-                
-                dest_coords = geocode['features'][0]['geometry']['coordinates']
-                
-                # 2. Get Walking Directions
-                route = directions(
-                    self.client, 
-                    coordinates=[DEMO_ORIGIN_COORDS, dest_coords],
-                    profile='foot-walking', 
-                    format='geojson'
-                )
-                
-                # 3. Parse & Convert to Steps
-                segments = route['features'][0]['properties']['segments']
-                self.steps.append(f"Route calculated. Walking to {end_text}.")
-                
-                for segment in segments:
-                    for step in segment['steps']:
-                        instr = step['instruction']
-                        dist_meters = int(step['distance'])
-                        
-                        if dist_meters > 0:
-                            # [LOGIC] 1 Step approx 0.75 meters
-                            steps_count = int(dist_meters / 0.75)
-                            self.steps.append(f"In {steps_count} steps, {instr}")
-                        else:
-                            self.steps.append(instr)
-                            
-                self.steps.append("You have arrived.")
-
+                dest_coords, visit = resolved
+                steps = self._fetch_route(dest_coords, end_text)
+                self._record_visit(visit)
             except Exception as e:
                 print(f"[Nav] API Error: {e}")
-        
-        # Fallback
-        if not self.steps:
-            print("[Nav] Using Mock Route.")
-            self.steps = self.mock_route
 
-        self.current_step_index = 0
-        self.is_navigating = True
-        self.last_update_time = time.time()
-        return f"Navigating to {end_text}."
+        return self._start_route(steps, end_text)
+
+    async def calculate_route_async(self, start_text, end_text):
+        """
+        Same as calculate_route, but the ORS calls run on the service
+        layer's I/O pool with deadline and jittered retries.
+        """
+        print(f"[Nav] Calculating: {start_text} -> {end_text}")
+        steps = []
+
+        if self.client and self.services:
+            async def _route():
+                # Local lookup once, outside any retry; only the ORS calls are retried
+                resolved = self._local_lookup(end_text)
+                if resolved is None:
+                    resolved = await self.services.call(
+                        lambda: self.services.run_blocking(self._geocode, end_text))
+                if resolved is None:
+                    return None
+                dest_coords, visit = resolved
+                steps = await self.services.call(
+                    lambda: self.services.run_blocking(self._fetch_route, dest_coords, end_text))
+                # Visit counted (and places.tsv rewritten) once, after the route succeeded
+                await self.services.run_blocking(self._record_visit, visit)
+                return steps
+
+            try:
+                steps = await asyncio.wait_for(_route(), timeout=ROUTE_DEADLINE)
+                if steps is None:
+                    return f"Could not find location: {end_text}"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Nav] API Error: {e!r}")
+
+        return self._start_route(steps, end_text)
 
     def get_next_instruction(self):
         """Returns next instruction based on timer."""
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import time
+from config import SCENE_THUMB_SIZE, SCENE_DIFF_THRESHOLD, SCENE_SHIFT_THRESHOLD, SCENE_MAX_STALENESS
+
+class SceneChangeGate:
+    """
+    Decides whether a frame needs a fresh YOLO pass or whether the last
+    detections can be reused. Works on a tiny grayscale thumbnail:
+      - mean absolute difference vs. the last inferred thumbnail
+      - global shift via phase correlation (camera pan / walking)
+    A fresh pass is always forced once the detections are SCENE_MAX_STALENESS old.
+    """
+
+    def __init__(self, thumb_size=SCENE_THUMB_SIZE, diff_threshold=SCENE_DIFF_THRESHOLD,
+                 shift_threshold=SCENE_SHIFT_THRESHOLD, max_staleness=SCENE_MAX_STALENESS):
+        self.thumb_size = thumb_size
+        self.diff_threshold = diff_threshold
+        self.shift_threshold = shift_threshold
+        self.max_staleness = max_staleness
+
+        self.reference = None       # Thumbnail of the last inferred frame
+        self.last_infer_time = 0.0
+        self.window = cv2.createHanningWindow(thumb_size, cv2.CV_32F)
+
+        # Stats
+        self.frames = 0
+        self.skipped = 0
+        self.worst_staleness = 0.0  # Oldest detections ever reused (seconds)
+
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def should_infer(self, frame, force=False):
+        """Returns True if the frame must be analyzed; False to reuse last detections."""
+        now = time.time()
+        self.frames += 1
+        thumb = self.thumbnail(frame)
+        age = now - self.last_infer_time
+
+        changed = force or self.reference is None or age >= self.max_staleness
+        if not changed:
+            diff = float(np.mean(np.abs(thumb - self.reference)))
+            if diff > self.diff_threshold:
+                changed = True
+            elif diff > 0.5:
+                # Small photometric change may still be a pan over a flat scene
+                (dx, dy), response = cv2.phaseCorrelate(self.reference, thumb, self.window)
+                # Weak peak = no reliable shift estimate (flat / noisy thumbnail)
+                changed = response > 0.1 and (dx * dx + dy * dy) ** 0.5 > self.shift_threshold
+
+        if changed:
+            self.reference = thumb
+            self.last_infer_time = now
+            return True
+
+        self.skipped += 1
+        self.worst_staleness = max(self.worst_staleness, age)
+        return False
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def report(self):
+        return (f"[Gate] {self.frames} frames, skip ratio {self.skip_ratio:.1%}, "
+                f"worst staleness {self.worst_staleness * 1000:.0f} ms "
+                f"(cap {self.max_staleness * 1000:.0f} ms)")
@@ -0,0 +1,143 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import SERVICE_MAX_CONCURRENCY, SERVICE_MAX_RETRIES, SERVICE_RETRY_BASE_DELAY
+
+class ServiceLayer:
+    """
+    Runs all network and device I/O on a private asyncio loop so the
+    safety loop in main() never waits on Gemini, ORS or the microphone.
+
+    - call():   bounded concurrency + retry with full jitter + deadline
+    - submit(): fire-and-forget job keyed by name; a new job with the same
+                key cancels the one it supersedes
+    """
+
+    def __init__(self, max_concurrency=SERVICE_MAX_CONCURRENCY,
+                 max_retries=SERVICE_MAX_RETRIES, retry_base_delay=SERVICE_RETRY_BASE_DELAY):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        # Blocking clients (pyaudio, ORS/requests) are pushed here
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="io")
+        self._semaphore = None
+        self._inflight = {}  # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _init_loop_state(self):
+        # Created on the loop itself (Python 3.9 binds primitives at construction)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._init_loop_state(), self.loop).result()
+        print(f"[Service] Async I/O layer online (max {self.max_concurrency} concurrent).")
+        return self
+
+    def stop(self):
+        with self._lock:
+            pending = list(self._inflight.values())
+            self._inflight.clear()
+        for fut in pending:
+            fut.cancel()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._executor.shutdown(wait=False)
+
+    # --- LOOP-SIDE HELPERS (await these from coroutines) ---
+
+    async def call(self, coro_fn, deadline=None, retries=None):
+        """
+        Awaits coro_fn() under the concurrency limit, retrying transient
+        failures with exponential backoff + full jitter. The deadline covers
+        queueing, every attempt and every backoff sleep.
+        """
+        retries = self.max_retries if retries is None else retries
+        if deadline is None:
+            return await self._with_retry(coro_fn, retries)
+        return await asyncio.wait_for(self._with_retry(coro_fn, retries), timeout=deadline)
+
+    async def run_blocking(self, fn, *args):
+        """
+        Runs a blocking function on the I/O pool. Note: cancelling the
+        awaiting task abandons the result but cannot interrupt the thread.
+        """
+        return await self.loop.run_in_executor(self._executor, fn, *args)
+
+    async def _with_retry(self, coro_fn, retries):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await coro_fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= retries or not self._is_retryable(e):
+                    raise
+                delay = random.uniform(0, self.retry_base_delay * (2 ** attempt))
+                attempt += 1
+                print(f"[Service] Retry {attempt}/{retries} in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(exc):
+        # Client errors will fail the same way again (429 is the exception)
+        status = getattr(exc, 'code', None) or getattr(exc, 'status', None)
+        if isinstance(status, int) and 400 <= status < 500 and status != 429:
+            return False
+        return not isinstance(exc, (ValueError, TypeError))
+
+    # --- THREAD-SIDE INTERFACE (call these from main / engines) ---
+
+    def submit(self, key, coro_fn, deadline=None, on_result=None, on_error=None):
+        """
+        Schedules coro_fn() on the loop and returns immediately.
+        Any earlier job with the same key is cancelled (superseded).
+        Callbacks run on the loop thread; cancelled jobs call neither.
+        """
+        expires = None if deadline is None else time.monotonic() + deadline
+
+        async def _job():
+            if expires is None:
+                return await coro_fn()
+            return await asyncio.wait_for(coro_fn(), timeout=max(0.0, expires - time.monotonic()))
+
+        fut = asyncio.run_coroutine_threadsafe(_job(), self.loop)
+        with self._lock:
+            previous = self._inflight.get(key)
+            self._inflight[key] = fut
+        if previous is not None and not previous.done():
+            print(f"[Service] Superseding '{key}'")
+            previous.cancel()
+
+        def _done(f):
+            with self._lock:
+                if self._inflight.get(key) is f:
+                    del self._inflight[key]
+            if f.cancelled():
+                return
+            exc = f.exception()
+            if exc is not None:
+                if on_error: on_error(exc)
+                else: print(f"[Service] '{key}' failed: {exc!r}")
+            elif on_result:
+                on_result(f.result())
+
+        fut.add_done_callback(_done)
+        return fut
+
+    def is_busy(self, key=None):
+        with self._lock:
+            if key is None:
+                return bool(self._inflight)
+            fut = self._inflight.get(key)
+        return fut is not None and not fut.done()
@@ -0,0 +1,232 @@
+import numpy as np
+import threading
+import time
+from collections import deque
+from config import (MIXER_MAX_VOICES, MIXER_ITD_MAX, MIXER_DUCK_LEVEL,
+                    MIXER_SPEECH_GAIN, MIXER_PAN_SMOOTHING)
+
+TWO_PI = 2 * np.pi
+
+# Rows of the per-voice parameter table
+FREQ, DEPTH, SWEEP, RATE, DUTY, GAIN, PAN = range(7)
+
+class SpatialMixer:
+    """
+    Real-time mixer for the sounddevice callback.
+
+    Each voice is a sine (optionally swept like the siren) gated into
+    beeps, placed in space with an interaural level difference (equal-power
+    pan) and an interaural time difference (far ear delayed up to
+    MIXER_ITD_MAX). Pre-rendered speech is mixed on top and ducks the
+    voices while it plays.
+
+    render() works on buffers allocated here, with out= everywhere, so the
+    callback does no array allocation. Control threads only touch the
+    staged parameter table via set_voice()/queue_speech().
+    """
+
+    def __init__(self, sample_rate, blocksize=512, max_voices=MIXER_MAX_VOICES, volume=0.5):
+        self.sr = sample_rate
+        self.N = N = blocksize
+        self.K = K = max_voices
+        self.volume = volume
+        self.itd_samples = MIXER_ITD_MAX * sample_rate
+        self.D = D = int(np.ceil(self.itd_samples)) + 1  # Delay history per voice
+
+        # Parameter tables: staged (control thread) -> target (audio thread)
+        self._staged = np.zeros((7, K, 1))
+        self._staged[DUTY] = 1.0
+        self._target = self._staged.copy()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        # Per-voice running state, shape (K, 1) to broadcast against (K, N)
+        self.phase = np.zeros((K, 1))
+        self.sweep_phase = np.zeros((K, 1))
+        self.pulse_phase = np.zeros((K, 1))
+        self.cur_gain = np.zeros((K, 1))
+        self.cur_pan = np.zeros((K, 1))
+        self.cur_duck = 1.0
+
+        # Scratch buffers
+        self.n_row = np.arange(N, dtype=np.float64).reshape(1, N)
+        self.ramp = (self.n_row + 1) / N
+        self.ramp_1d = self.ramp.reshape(N)
+        self.f = np.empty((K, N))
+        self.ph = np.empty((K, N))
+        self.g = np.empty((K, N))
+        self.gate = np.empty((K, N), dtype=bool)
+        self.mono = np.zeros((K, D + N))          # [history | current block]
+        self.mono_flat = self.mono.reshape(-1)    # View, for np.take
+        self.base_idx = (np.arange(K) * (D + N)).reshape(K, 1) + D + np.arange(N).reshape(1, N)
+        self.idx = np.empty((K, N), dtype=np.int64)
+        self.ear = np.empty((K, N))
+        self.tmpk = np.empty((K, 1))
+        self.delay = np.empty((K, 1))
+        self.delay_far = np.empty((K, 1))
+        self.delay_i = np.empty((K, 1), dtype=np.int64)
+        self.right_side = np.empty((K, 1), dtype=bool)
+        self.ild_l = np.empty((K, 1))
+        self.ild_r = np.empty((K, 1))
+        self.mix_l = np.empty(N)
+        self.mix_r = np.empty(N)
+        self.duck = np.empty(N)
+        self.speech = np.zeros(N)
+
+        # Speech clips (float mono at self.sr), consumed by the callback
+        self._speech_queue = deque()
+        self._speech_clip = None
+        self._speech_pos = 0
+
+        # Deadline stats
+        self.blocks = 0
+        self.worst_render = 0.0
+        self.late_blocks = 0
+
+    # --- CONTROL INTERFACE (any thread) ---
+
+    def set_voice(self, i, freq=440.0, gain=0.0, pan=0.0, pulse_rate=0.0, duty=1.0,
+                  sweep_depth=0.0, sweep_rate=0.0):
+        """pulse_rate=0 / duty=1 means a continuous tone; gain=0 fades the voice out."""
+        with self._lock:
+            s = self._staged
+            s[FREQ, i], s[DEPTH, i], s[SWEEP, i] = freq, sweep_depth, sweep_rate
+            s[RATE, i], s[DUTY, i] = pulse_rate, duty
+            s[GAIN, i], s[PAN, i] = gain, max(-1.0, min(1.0, pan))
+            self._dirty = True
+
+    def queue_speech(self, samples):
+        self._speech_queue.append(np.ascontiguousarray(samples, dtype=np.float64))
+
+    @property
+    def is_speaking(self):
+        return self._speech_clip is not None or bool(self._speech_queue)
+
+    def report(self):
+        deadline_ms = 1000 * self.N / self.sr
+        return (f"[Mixer] {self.blocks} blocks, worst render {self.worst_render * 1000:.2f} ms "
+                f"of {deadline_ms:.1f} ms deadline, {self.late_blocks} late")
+
+    # --- AUDIO THREAD ---
+
+    def _apply_staged(self):
+        # Never block the callback: if a control thread holds the lock, try next block
+        if self._dirty and self._lock.acquire(blocking=False):
+            np.copyto(self._target, self._staged)
+            self._dirty = False
+            self._lock.release()
+
+    def _render_speech(self):
+        """Fills self.speech with the next N samples; returns True while speech plays."""
+        if self._speech_clip is None:
+            if not self._speech_queue:
+                self.speech.fill(0)
+                return False
+            self._speech_clip = self._speech_queue.popleft()
+            self._speech_pos = 0
+
+        clip, pos, N = self._speech_clip, self._speech_pos, self.N
+        n = min(N, len(clip) - pos)
+        self.speech[:n] = clip[pos:pos + n]
+        self.speech[n:] = 0
+        self._speech_pos = pos + n
+        if self._speech_pos >= len(clip):
+            self._speech_clip = None
+        return True
+
+    def render(self, outdata, frames):
+        t0 = time.perf_counter()
+        if frames != self.N:
+            outdata.fill(0)
+            return
+
+        self._apply_staged()
+        t, N, D, sr = self._target, self.N, self.D, self.sr
+        ph, f, g, tmpk = self.ph, self.f, self.g, self.tmpk
+        body = self.mono[:, D:]
+
+        # 1. Keep the last D samples of each voice for the interaural delay
+        self.mono[:, :D] = self.mono[:, N:]
+
+        # 2. Instantaneous frequency: f = freq + depth * |sin(2*pi*sweep phase)|
+        np.multiply(self.n_row, t[SWEEP], out=ph)
+        np.divide(ph, sr, out=ph)
+        np.add(ph, self.sweep_phase, out=ph)
+        np.multiply(ph, TWO_PI, out=ph)
+        np.sin(ph, out=ph)
+        np.abs(ph, out=ph)
+        np.multiply(ph, t[DEPTH], out=f)
+        np.add(f, t[FREQ], out=f)
+        np.multiply(t[SWEEP], N / sr, out=tmpk)
+        np.add(self.sweep_phase, tmpk, out=self.sweep_phase)
+        np.remainder(self.sweep_phase, 1.0, out=self.sweep_phase)
+
+        # 3. Integrate phase (continuous across blocks) and synthesize
+        np.cumsum(f, axis=1, out=ph)
+        np.multiply(ph, TWO_PI / sr, out=ph)
+        np.add(ph, self.phase, out=ph)
+        np.remainder(ph[:, -1:], TWO_PI, out=self.phase)
+        np.sin(ph, out=body)
+
+        # 4. Beep gate and de-clicked gain ramp
+        np.multiply(self.n_row, t[RATE], out=g)
+        np.divide(g, sr, out=g)
+        np.add(g, self.pulse_phase, out=g)
+        np.remainder(g, 1.0, out=g)
+        np.less(g, t[DUTY], out=self.gate)
+        np.multiply(t[RATE], N / sr, out=tmpk)
+        np.add(self.pulse_phase, tmpk, out=self.pulse_phase)
+        np.remainder(self.pulse_phase, 1.0, out=self.pulse_phase)
+
+        np.subtract(t[GAIN], self.cur_gain, out=tmpk)
+        np.multiply(self.ramp, tmpk, out=g)
+        np.add(g, self.cur_gain, out=g)
+        np.multiply(g, self.gate, out=g)
+        np.multiply(body, g, out=body)
+        np.copyto(self.cur_gain, t[GAIN])
+
+        # 5. Pan glide -> ILD (equal power) and ITD (delay on the far ear)
+        np.subtract(t[PAN], self.cur_pan, out=tmpk)
+        np.multiply(tmpk, MIXER_PAN_SMOOTHING, out=tmpk)
+        np.add(self.cur_pan, tmpk, out=self.cur_pan)
+        np.add(self.cur_pan, 1.0, out=tmpk)
+        np.multiply(tmpk, np.pi / 4, out=tmpk)
+        np.cos(tmpk, out=self.ild_l)
+        np.sin(tmpk, out=self.ild_r)
+
+        np.abs(self.cur_pan, out=self.delay)
+        np.multiply(self.delay, self.itd_samples, out=self.delay)
+        np.rint(self.delay, out=self.delay)
+        np.greater(self.cur_pan, 0.0, out=self.right_side)
+
+        # Source on the right -> left ear hears it later
+        np.multiply(self.delay, self.right_side, out=self.delay_far)
+        self._ear_mix(self.delay_far, self.ild_l, self.mix_l)
+        np.subtract(self.delay, self.delay_far, out=self.delay_far)
+        self._ear_mix(self.delay_far, self.ild_r, self.mix_r)
+
+        # 6. Speech on top, ducking the hazard voices while it plays
+        speaking = self._render_speech()
+        duck_target = MIXER_DUCK_LEVEL if speaking else 1.0
+        np.multiply(self.ramp_1d, duck_target - self.cur_duck, out=self.duck)
+        np.add(self.duck, self.cur_duck, out=self.duck)
+        self.cur_duck = duck_target
+        np.multiply(self.duck, self.volume, out=self.duck)
+        np.multiply(self.speech, MIXER_SPEECH_GAIN, out=self.speech)
+        for mix, channel in ((self.mix_l, 0), (self.mix_r, 1)):
+            np.multiply(mix, self.duck, out=mix)
+            np.add(mix, self.speech, out=mix)
+            np.clip(mix, -1.0, 1.0, out=mix)
+            outdata[:, channel] = mix
+
+        elapsed = time.perf_counter() - t0
+        self.blocks += 1
+        self.worst_render = max(self.worst_render, elapsed)
+        if elapsed > N / sr: self.late_blocks += 1
+
+    def _ear_mix(self, delay, ild, out):
+        np.copyto(self.delay_i, delay, casting='unsafe')
+        np.subtract(self.base_idx, self.delay_i, out=self.idx)
+        np.take(self.mono_flat, self.idx, out=self.ear, mode='clip')
+        np.multiply(self.ear, ild, out=self.ear)
+        np.sum(self.ear, axis=0, out=out)
@@ -1,5 +1,5 @@
 import cv2
-from threading import Thread
+from threading import Thread, Condition
 import time
 # FIXED: Removed '.' before config
 from config import CAMERA_SOURCE
@@ -14,6 +14,9 @@ class VisionStream:
         self.stopped = False
         self.grabbed = False
         self.frame = None
+        self.frame_id = 0             # Increments on every new camera frame
+        self.new_frame = Condition()
+        self.gesture = None # Optional per-frame processor (e.g. CoverGestureDetector)
         
         # Check connection
         if not self.cap.isOpened():
@@ -38,7 +41,16 @@ class VisionStream:
             
             if grabbed:
                 self.grabbed = grabbed
-                self.frame = frame
+                with self.new_frame:
+                    self.frame = frame
+                    self.frame_id += 1
+                    self.new_frame.notify_all()
+                if self.gesture:
+                    # Runs at camera rate, independent of the inference loop
+                    try:
+                        self.gesture.process(frame)
+                    except Exception as e:
+                        print(f"[Vision] Gesture error: {e}")
             else:
                 # If stream disconnects, try to reconnect briefly
                 time.sleep(0.1)
@@ -47,5 +59,14 @@ class VisionStream:
         """Return the most recent frame."""
         return self.frame
 
+    def read_new(self, last_id, timeout=0.5):
+        """
+        Blocks until a frame newer than last_id arrives (or timeout).
+        Returns (frame, frame_id); frame_id == last_id means no new frame.
+        """
+        with self.new_frame:
+            self.new_frame.wait_for(lambda: self.frame_id != last_id or self.stopped, timeout)
+            return self.frame, self.frame_id
+
     def stop(self):
         self.stopped = True
\ No newline at end of file